@@ -0,0 +1,13 @@
+-- Per-camera detection zones (regions of interest).
+-- polygon holds a JSON list of [x, y] points normalised to 0..1 of the frame size;
+-- a camera without active rows is scanned in full.
+CREATE TABLE IF NOT EXISTS camera_rois (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    camera_id INT NOT NULL,
+    polygon TEXT NOT NULL,
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (camera_id) REFERENCES cameras(id) ON DELETE CASCADE,
+    INDEX idx_camera (camera_id)
+);
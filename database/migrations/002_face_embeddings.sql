@@ -0,0 +1,6 @@
+-- Binary face encodings: 128 little-endian float32 values (512 bytes) per student,
+-- tagged with the model that produced them. Existing JSON rows in face_encoding are
+-- converted afterwards with face_detection/migrate_face_encodings.py.
+ALTER TABLE students
+    ADD COLUMN face_embedding BLOB NULL AFTER face_encoding,
+    ADD COLUMN face_model VARCHAR(32) NULL AFTER face_embedding;
@@ -0,0 +1,11 @@
+-- Grades each camera can plausibly see (a classroom door, a building, a campus).
+-- Faces seen by a linked camera are matched against those grades' students first;
+-- a camera without rows searches the whole school.
+CREATE TABLE IF NOT EXISTS camera_grades (
+    camera_id INT NOT NULL,
+    grade_id INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (camera_id, grade_id),
+    FOREIGN KEY (camera_id) REFERENCES cameras(id) ON DELETE CASCADE,
+    FOREIGN KEY (grade_id) REFERENCES grades(id) ON DELETE CASCADE
+);
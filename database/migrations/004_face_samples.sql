@@ -0,0 +1,14 @@
+-- Every face encoding captured at enrollment, several per student. Rows flagged
+-- is_prototype are the k-medoids the gallery matches against; the rest are only
+-- consulted to settle close calls. students.face_embedding holds the main prototype.
+CREATE TABLE IF NOT EXISTS student_face_samples (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    student_id INT NOT NULL,
+    embedding BLOB NOT NULL,
+    face_model VARCHAR(32) NOT NULL,
+    is_prototype BOOLEAN DEFAULT FALSE,
+    image_path VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
+    INDEX idx_student (student_id)
+);
@@ -8,9 +8,17 @@ import os
 import sys
 import json
 import face_recognition
+import numpy as np
 import pymysql
 from PIL import Image
 import argparse
+from multiprocessing import Pool
+
+# Encoding storage format is shared with the face detection service
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'face_detection'))
+from gallery import FACE_MODEL, encoding_to_blob, select_prototypes
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
 
 def get_db_connection():
     """Get database connection"""
@@ -24,11 +32,20 @@ def get_db_connection():
     
     return pymysql.connect(**db_config)
 
-def generate_face_encoding(image_path):
+def load_image(image_path, max_size=None):
+    """Load an image as RGB, shrinking it so neither side exceeds max_size pixels"""
+    with Image.open(image_path) as image:
+        image = image.convert('RGB')
+        # Phone photos are several times larger than HOG needs to find a portrait face
+        if max_size and max(image.size) > max_size:
+            image.thumbnail((max_size, max_size), Image.BILINEAR)
+        return np.array(image)
+
+def generate_face_encoding(image_path, max_size=None):
     """Generate face encoding from image"""
     try:
         # Load image
-        image = face_recognition.load_image_file(image_path)
+        image = load_image(image_path, max_size)
         
         # Find face locations
         face_locations = face_recognition.face_locations(image)
@@ -50,90 +67,196 @@ def generate_face_encoding(image_path):
     except Exception as e:
         return None, f"Error processing image: {str(e)}"
 
-def update_student_face_encoding(student_id, face_encoding):
-    """Update student's face encoding in database"""
-    try:
-        connection = get_db_connection()
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                UPDATE students 
-                SET face_encoding = %s 
-                WHERE id = %s
-            """, (json.dumps(face_encoding), student_id))
-            
-            connection.commit()
-        
-        connection.close()
-        return True, "Face encoding updated successfully"
+def student_images(face_image_path, roll_number, samples_dir=None):
+    """The student's uploaded photo plus any extra photos in samples_dir/<roll_number>/"""
+    image_paths = []
+    if face_image_path:
+        image_paths.append(f"../src/{face_image_path}")
+    
+    student_dir = os.path.join(samples_dir, str(roll_number)) if samples_dir else None
+    if student_dir and os.path.isdir(student_dir):
+        for file_name in sorted(os.listdir(student_dir)):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                image_paths.append(os.path.join(student_dir, file_name))
+    return image_paths
+
+def encode_images(image_paths, max_size=None):
+    """Encode every usable photo; returns [(image_path, encoding)] and a list of error messages"""
+    samples = []
+    errors = []
+    for image_path in image_paths:
+        if not os.path.exists(image_path):
+            errors.append(f"{image_path}: Image file not found")
+            continue
+        face_encoding, message = generate_face_encoding(image_path, max_size)
+        if face_encoding is None:
+            errors.append(f"{image_path}: {message}")
+        else:
+            samples.append((image_path, face_encoding))
+    return samples, errors
+
+def build_enrollment(student_id, samples, prototypes=3):
+    """Pick k-medoid prototypes among a student's samples
+
+    Returns (main prototype blob, student_id, [(student_id, blob, model, is_prototype, image_path)]).
+    """
+    medoids = select_prototypes([encoding for _, encoding in samples], prototypes)
+    sample_rows = [
+        (student_id, encoding_to_blob(encoding), FACE_MODEL, i in medoids, image_path)
+        for i, (image_path, encoding) in enumerate(samples)
+    ]
+    return encoding_to_blob(samples[medoids[0]][1]), student_id, sample_rows
+
+def save_enrollments(connection, enrollments):
+    """Write one batch of enrollments (students row plus all samples) in a single transaction"""
+    student_ids = [student_id for _, student_id, _ in enrollments]
+    with connection.cursor() as cursor:
+        # updated_at is bumped explicitly so a re-enrollment with the same main prototype still
+        # reaches the detection service's incremental refresh
+        cursor.executemany("""
+            UPDATE students 
+            SET face_embedding = %s, face_model = %s, face_encoding = NULL, updated_at = CURRENT_TIMESTAMP 
+            WHERE id = %s
+        """, [(blob, FACE_MODEL, student_id) for blob, student_id, _ in enrollments])
         
-    except Exception as e:
-        return False, f"Database error: {str(e)}"
+        cursor.execute(
+            "DELETE FROM student_face_samples WHERE student_id IN (" + ", ".join(["%s"] * len(student_ids)) + ")",
+            student_ids
+        )
+        cursor.executemany("""
+            INSERT INTO student_face_samples (student_id, embedding, face_model, is_prototype, image_path) 
+            VALUES (%s, %s, %s, %s, %s)
+        """, [row for _, _, sample_rows in enrollments for row in sample_rows])
+    connection.commit()
 
-def process_student_image(student_id, image_path):
-    """Process a single student's image"""
-    print(f"Processing student ID {student_id}...")
+def process_student_images(student_id, image_paths, max_size=None, prototypes=3):
+    """Enroll a single student from one or more images"""
+    print(f"Processing student ID {student_id} ({len(image_paths)} images)...")
     
-    # Generate face encoding
-    face_encoding, message = generate_face_encoding(image_path)
+    samples, errors = encode_images(image_paths, max_size)
+    for error in errors:
+        print(f"  Skipped {error}")
     
-    if face_encoding is None:
-        print(f"  Error: {message}")
+    if not samples:
+        print("  Error: No usable face images")
         return False
     
-    # Update database
-    success, db_message = update_student_face_encoding(student_id, face_encoding)
+    try:
+        enrollment = build_enrollment(student_id, samples, prototypes)
+    except (ValueError, TypeError) as e:
+        print(f"  Error selecting prototypes: {str(e)}")
+        return False
     
-    if success:
-        print(f"  Success: {db_message}")
-        return True
-    else:
-        print(f"  Database Error: {db_message}")
+    # Update database
+    try:
+        connection = get_db_connection()
+        try:
+            save_enrollments(connection, [enrollment])
+        finally:
+            connection.close()
+    except Exception as e:
+        print(f"  Database Error: {str(e)}")
         return False
+    
+    print(f"  Success: {len(samples)} samples, {min(len(samples), prototypes)} prototypes stored")
+    return True
+
+def encode_student(student):
+    """Pool task: encode one student's photos, returning (student_id, name, roll_number, samples, errors)"""
+    student_id, roll_number, name, face_image_path, max_size, samples_dir = student
+    samples, errors = encode_images(student_images(face_image_path, roll_number, samples_dir), max_size)
+    return student_id, name, roll_number, samples, errors
+
+def read_checkpoint(checkpoint_path):
+    """Highest student ID already handled by an interrupted run, or 0"""
+    try:
+        with open(checkpoint_path) as f:
+            return int(json.load(f)['last_id'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0
+
+def write_checkpoint(checkpoint_path, last_id):
+    """Record progress atomically so a crash never leaves a truncated checkpoint"""
+    with open(checkpoint_path + '.tmp', 'w') as f:
+        json.dump({'last_id': last_id}, f)
+    os.replace(checkpoint_path + '.tmp', checkpoint_path)
 
-def process_all_students():
+def process_all_students(workers=1, batch_size=50, max_size=1024, checkpoint_path=None,
+                         samples_dir=None, prototypes=3):
     """Process all students with face images but no encodings"""
     try:
+        # Students are handled in ID order, so one ID marks how far an interrupted run got
+        last_id = read_checkpoint(checkpoint_path) if checkpoint_path else 0
+        if last_id:
+            print(f"Resuming after student ID {last_id} (delete {checkpoint_path} to start over)")
+        
         connection = get_db_connection()
         with connection.cursor() as cursor:
             cursor.execute("""
                 SELECT id, roll_number, name, face_image_path 
                 FROM students 
                 WHERE face_image_path IS NOT NULL 
-                AND face_encoding IS NULL 
+                AND face_embedding IS NULL 
                 AND is_active = 1
-            """)
+                AND id > %s
+                ORDER BY id
+            """, (last_id,))
             
             students = cursor.fetchall()
         
-        connection.close()
-        
         if not students:
+            connection.close()
             print("No students found with face images but no encodings.")
             return
         
-        print(f"Found {len(students)} students to process...")
+        print(f"Found {len(students)} students to process with {workers} worker(s)...")
         
+        tasks = [student + (max_size, samples_dir) for student in students]
         success_count = 0
+        processed = 0
+        enrollments = []
+        pool = Pool(workers) if workers > 1 else None
         
-        for student in students:
-            student_id, roll_number, name, face_image_path = student
-            
-            # Check if image file exists
-            full_image_path = f"../src/{face_image_path}"
-            
-            if not os.path.exists(full_image_path):
-                print(f"  Error: Image file not found for {name} ({roll_number})")
-                continue
+        try:
+            # imap streams results back in submission order as soon as each one is ready
+            results = pool.imap(encode_student, tasks, chunksize=4) if pool else map(encode_student, tasks)
             
-            if process_student_image(student_id, full_image_path):
-                success_count += 1
+            for student_id, name, roll_number, samples, errors in results:
+                processed += 1
+                for error in errors:
+                    print(f"  Skipped {error} for {name} ({roll_number})")
+                if not samples:
+                    print(f"  Error: No usable face images for {name} ({roll_number})")
+                else:
+                    # One bad student must not lose the batch collected so far
+                    try:
+                        enrollments.append(build_enrollment(student_id, samples, prototypes))
+                    except (ValueError, TypeError) as e:
+                        print(f"  Error selecting prototypes for {name} ({roll_number}): {str(e)}")
+                
+                if len(enrollments) >= batch_size or processed == len(tasks):
+                    if enrollments:
+                        save_enrollments(connection, enrollments)
+                        success_count += len(enrollments)
+                        enrollments = []
+                    if checkpoint_path:
+                        write_checkpoint(checkpoint_path, student_id)
+                    print(f"Processed {processed}/{len(tasks)} students, {success_count} encodings saved...")
+        finally:
+            if pool:
+                pool.terminate()
+            connection.close()
+        
+        # A finished run needs no checkpoint; the next one picks up newly added students
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
         
         print(f"\nProcessing complete: {success_count}/{len(students)} students processed successfully.")
         
     except Exception as e:
         print(f"Error processing students: {str(e)}")
 
-def process_single_student(student_id):
+def process_single_student(student_id, max_size=1024, extra_images=None, samples_dir=None, prototypes=3):
     """Process a single student by ID"""
     try:
         connection = get_db_connection()
@@ -154,18 +277,12 @@ def process_single_student(student_id):
         
         student_id, roll_number, name, face_image_path = student
         
-        if not face_image_path:
+        image_paths = student_images(face_image_path, roll_number, samples_dir) + list(extra_images or [])
+        if not image_paths:
             print(f"Student {name} ({roll_number}) has no face image.")
             return
         
-        # Check if image file exists
-        full_image_path = f"../src/{face_image_path}"
-        
-        if not os.path.exists(full_image_path):
-            print(f"Image file not found: {full_image_path}")
-            return
-        
-        process_student_image(student_id, full_image_path)
+        process_student_images(student_id, image_paths, max_size, prototypes)
         
     except Exception as e:
         print(f"Error processing student: {str(e)}")
@@ -174,18 +291,32 @@ def main():
     parser = argparse.ArgumentParser(description='Generate face encodings for Smart Attendance System')
     parser.add_argument('--student-id', type=int, help='Process specific student by ID')
     parser.add_argument('--all', action='store_true', help='Process all students with face images')
+    parser.add_argument('--workers', type=int, default=1, help='Encoding processes for --all (default: 1)')
+    parser.add_argument('--batch-size', type=int, default=50, help='Encodings written per transaction')
+    parser.add_argument('--max-size', type=int, default=1024,
+                        help='Shrink photos so neither side exceeds this many pixels (0 keeps full resolution)')
+    parser.add_argument('--checkpoint', default='generate_face_encodings.checkpoint',
+                        help='Progress file used to resume an interrupted --all run')
+    parser.add_argument('--images', nargs='+', help='Extra photos of the student given by --student-id')
+    parser.add_argument('--samples-dir', help='Directory with extra photos per student in <roll_number>/ folders')
+    parser.add_argument('--prototypes', type=int, default=3, help='Prototype encodings kept per student')
     
     args = parser.parse_args()
+    prototypes = max(1, args.prototypes)
     
     if args.student_id:
-        process_single_student(args.student_id)
+        process_single_student(args.student_id, args.max_size, args.images, args.samples_dir, prototypes)
     elif args.all:
-        process_all_students()
+        process_all_students(max(1, args.workers), max(1, args.batch_size), args.max_size, args.checkpoint,
+                             args.samples_dir, prototypes)
     else:
         print("Please specify --student-id <id> or --all")
         print("Examples:")
         print("  python generate_face_encodings.py --student-id 1")
         print("  python generate_face_encodings.py --all")
+        print("  python generate_face_encodings.py --all --workers 4")
+        print("  python generate_face_encodings.py --student-id 1 --images front.jpg left.jpg right.jpg")
+        print("  python generate_face_encodings.py --all --samples-dir ../src/uploads/faces/samples")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Face Encoding Migration for Smart Attendance System
+Converts JSON text encodings in students.face_encoding to float32 BLOBs in
+students.face_embedding. Run database/migrations/002_face_embeddings.sql first.
+"""
+
+import os
+import sys
+import json
+import argparse
+import pymysql
+
+# Encoding storage format is shared with the face detection service
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'face_detection'))
+from gallery import FACE_MODEL, ENCODING_DIM, encoding_to_blob
+
+def get_db_connection():
+    """Get database connection"""
+    db_config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'user': os.getenv('DB_USER', 'attendance_user'),
+        'password': os.getenv('DB_PASS', 'attendance_pass'),
+        'database': os.getenv('DB_NAME', 'smart_attendance'),
+        'charset': 'utf8mb4'
+    }
+
+    return pymysql.connect(**db_config)
+
+def migrate(batch_size=1000, keep_json=False, dry_run=False):
+    """Convert every JSON encoding without a binary one, one batch per transaction"""
+    connection = get_db_connection()
+    last_id = 0
+    converted = 0
+    failed = 0
+
+    try:
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute("""
+                    SELECT id, face_encoding
+                    FROM students
+                    WHERE id > %s AND face_embedding IS NULL AND face_encoding IS NOT NULL
+                    ORDER BY id
+                    LIMIT %s
+                """, (last_id, batch_size))
+
+                rows = cursor.fetchall()
+
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            updates = []
+            for student_id, face_encoding_str in rows:
+                try:
+                    face_encoding = json.loads(face_encoding_str)
+                    if len(face_encoding) != ENCODING_DIM:
+                        raise ValueError(f"expected {ENCODING_DIM} values, got {len(face_encoding)}")
+                    updates.append((encoding_to_blob(face_encoding), FACE_MODEL, student_id))
+                except (ValueError, TypeError) as e:
+                    # Left as JSON so the row can be inspected or re-enrolled
+                    print(f"  Skipping student ID {student_id}: {e}")
+                    failed += 1
+
+            if updates and not dry_run:
+                with connection.cursor() as cursor:
+                    if keep_json:
+                        cursor.executemany("""
+                            UPDATE students SET face_embedding = %s, face_model = %s WHERE id = %s
+                        """, updates)
+                    else:
+                        cursor.executemany("""
+                            UPDATE students SET face_embedding = %s, face_model = %s, face_encoding = NULL WHERE id = %s
+                        """, updates)
+                connection.commit()
+
+            converted += len(updates)
+            print(f"Converted {converted} encodings (up to student ID {last_id})...")
+    finally:
+        connection.close()
+
+    action = "Would convert" if dry_run else "Converted"
+    print(f"\n{action} {converted} encodings to {FACE_MODEL} BLOBs, {failed} invalid rows skipped.")
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert JSON face encodings to binary storage')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows converted per transaction')
+    parser.add_argument('--keep-json', action='store_true', help='Keep the JSON copy in face_encoding')
+    parser.add_argument('--dry-run', action='store_true', help='Validate rows without writing')
+
+    args = parser.parse_args()
+    migrate(args.batch_size, args.keep_json, args.dry_run)
+
+if __name__ == "__main__":
+    main()
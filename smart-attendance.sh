@@ -188,6 +188,9 @@ fix_database() {
     # Drop all tables
     docker exec smart_attendance-db-1 mysql -u root -proot_password -e "USE smart_attendance; 
     DROP TABLE IF EXISTS detection_schedule;
+    DROP TABLE IF EXISTS camera_rois;
+    DROP TABLE IF EXISTS camera_grades;
+    DROP TABLE IF EXISTS student_face_samples;
     DROP TABLE IF EXISTS attendance;
     DROP TABLE IF EXISTS cameras;
     DROP TABLE IF EXISTS students;
@@ -247,6 +250,8 @@ fix_database() {
         parent_phone VARCHAR(20),
         parent_email VARCHAR(100),
         face_encoding TEXT,
+        face_embedding BLOB,
+        face_model VARCHAR(32),
         face_image_path VARCHAR(255),
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
@@ -300,6 +305,38 @@ fix_database() {
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
         FOREIGN KEY (camera_id) REFERENCES cameras(id) ON DELETE CASCADE,
         UNIQUE KEY unique_camera_day (camera_id, day_of_week)
+    );
+    
+    CREATE TABLE camera_rois (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        camera_id INT NOT NULL,
+        polygon TEXT NOT NULL,
+        is_active BOOLEAN DEFAULT TRUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (camera_id) REFERENCES cameras(id) ON DELETE CASCADE,
+        INDEX idx_camera (camera_id)
+    );
+    
+    CREATE TABLE camera_grades (
+        camera_id INT NOT NULL,
+        grade_id INT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (camera_id, grade_id),
+        FOREIGN KEY (camera_id) REFERENCES cameras(id) ON DELETE CASCADE,
+        FOREIGN KEY (grade_id) REFERENCES grades(id) ON DELETE CASCADE
+    );
+    
+    CREATE TABLE student_face_samples (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        student_id INT NOT NULL,
+        embedding BLOB NOT NULL,
+        face_model VARCHAR(32) NOT NULL,
+        is_prototype BOOLEAN DEFAULT FALSE,
+        image_path VARCHAR(255),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
+        INDEX idx_student (student_id)
     );" 2>/dev/null
 
     # Insert default data
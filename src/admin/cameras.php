@@ -1,6 +1,7 @@
 <?php
 require_once '../config/database.php';
 require_once '../models/Camera.php';
+require_once '../models/Grade.php';
 
 // Ensure authentication before any output
 Utils::requireAdmin();
@@ -35,14 +36,26 @@ if ($_SERVER['REQUEST_METHOD'] == 'POST') {
                 $camera->password = $_POST['password'];
                 $camera->location = $_POST['location'];
                 $camera->is_active = isset($_POST['is_active']) ? 1 : 0;
+                $grade_ids = isset($_POST['grade_ids']) && is_array($_POST['grade_ids']) ? $_POST['grade_ids'] : array();
                 
-                if ($camera->update()) {
+                if ($camera->update() && $camera->saveGrades($grade_ids)) {
                     $success_message = "Camera updated successfully!";
                 } else {
                     $error_message = "Failed to update camera.";
                 }
                 break;
                 
+            case 'save_zones':
+                $camera->id = $_POST['camera_id'];
+                $polygons = json_decode($_POST['polygons'], true);
+                
+                if (is_array($polygons) && $camera->saveZones($polygons)) {
+                    $success_message = count($polygons) ? "Detection zones saved successfully!" : "Detection zones cleared, the full frame will be scanned.";
+                } else {
+                    $error_message = "Failed to save detection zones.";
+                }
+                break;
+                
             case 'delete':
                 $camera->id = $_POST['camera_id'];
                 if ($camera->delete()) {
@@ -56,6 +69,16 @@ if ($_SERVER['REQUEST_METHOD'] == 'POST') {
 }
 
 $cameras = $camera->read();
+$camera_zones = $camera->readZones();
+$camera_grades = $camera->readGrades();
+
+$grade = new Grade($db);
+$grades = array();
+foreach ($grade->read()->fetchAll(PDO::FETCH_ASSOC) as $grade_row) {
+    if ($grade_row['is_active']) {
+        $grades[$grade_row['id']] = $grade_row['name'];
+    }
+}
 ?>
 <!DOCTYPE html>
 <html lang="en">
@@ -114,6 +137,25 @@ $cameras = $camera->read();
             border-color: #667eea;
             box-shadow: 0 0 0 0.2rem rgba(102, 126, 234, 0.25);
         }
+        .zone-editor {
+            position: relative;
+            background: #212529;
+            min-height: 240px;
+            border-radius: 10px;
+            overflow: hidden;
+        }
+        .zone-editor img {
+            display: block;
+            width: 100%;
+        }
+        .zone-editor canvas {
+            position: absolute;
+            top: 0;
+            left: 0;
+            width: 100%;
+            height: 100%;
+            cursor: crosshair;
+        }
         .camera-preview {
             width: 200px;
             height: 150px;
@@ -228,6 +270,8 @@ $cameras = $camera->read();
                                         <th>RTSP URL</th>
                                         <th>Username</th>
                                         <th>Status</th>
+                                        <th>Detection Zone</th>
+                                        <th>Grades</th>
                                         <th>Preview</th>
                                         <th>Actions</th>
                                     </tr>
@@ -249,6 +293,23 @@ $cameras = $camera->read();
                                                 <?php echo $row['is_active'] ? 'Active' : 'Inactive'; ?>
                                             </span>
                                         </td>
+                                        <td>
+                                            <?php $zone_count = isset($camera_zones[$row['id']]) ? count($camera_zones[$row['id']]) : 0; ?>
+                                            <span class="badge <?php echo $zone_count ? 'bg-info' : 'bg-secondary'; ?>">
+                                                <?php echo $zone_count ? $zone_count . ' zone' . ($zone_count > 1 ? 's' : '') : 'Full frame'; ?>
+                                            </span>
+                                        </td>
+                                        <td>
+                                            <?php $linked_grades = isset($camera_grades[$row['id']]) ? $camera_grades[$row['id']] : array(); ?>
+                                            <?php if (empty($linked_grades)): ?>
+                                            <span class="badge bg-secondary">All students</span>
+                                            <?php endif; ?>
+                                            <?php foreach ($linked_grades as $grade_id): ?>
+                                            <?php if (isset($grades[$grade_id])): ?>
+                                            <span class="badge bg-info"><?php echo htmlspecialchars($grades[$grade_id]); ?></span>
+                                            <?php endif; ?>
+                                            <?php endforeach; ?>
+                                        </td>
                                         <td>
                                             <div class="camera-preview">
                                                 <img src="http://localhost:5000/video_feed/<?php echo $row['id']; ?>" 
@@ -261,9 +322,12 @@ $cameras = $camera->read();
                                             </div>
                                         </td>
                                         <td>
-                                            <button class="btn btn-sm btn-outline-primary" onclick="editCamera(<?php echo htmlspecialchars(json_encode($row)); ?>)">
+                                            <button class="btn btn-sm btn-outline-primary" onclick="editCamera(<?php echo htmlspecialchars(json_encode($row)); ?>, <?php echo htmlspecialchars(json_encode(isset($camera_grades[$row['id']]) ? $camera_grades[$row['id']] : array())); ?>)">
                                                 <i class="fas fa-edit"></i>
                                             </button>
+                                            <button class="btn btn-sm btn-outline-info" title="Detection zones" onclick="editZones(<?php echo $row['id']; ?>, <?php echo htmlspecialchars(json_encode(isset($camera_zones[$row['id']]) ? $camera_zones[$row['id']] : array())); ?>)">
+                                                <i class="fas fa-draw-polygon"></i>
+                                            </button>
                                             <button class="btn btn-sm btn-outline-danger" onclick="deleteCamera(<?php echo $row['id']; ?>)">
                                                 <i class="fas fa-trash"></i>
                                             </button>
@@ -398,6 +462,16 @@ $cameras = $camera->read();
                                 </div>
                             </div>
                         </div>
+                        
+                        <div class="mb-3">
+                            <label for="edit_grade_ids" class="form-label">Grades Seen by This Camera</label>
+                            <select class="form-select" id="edit_grade_ids" name="grade_ids[]" multiple size="5">
+                                <?php foreach ($grades as $grade_id => $grade_name): ?>
+                                <option value="<?php echo $grade_id; ?>"><?php echo htmlspecialchars($grade_name); ?></option>
+                                <?php endforeach; ?>
+                            </select>
+                            <small class="form-text text-muted">Faces are matched against these grades first; leave empty to search all students</small>
+                        </div>
                     </div>
                     <div class="modal-footer">
                         <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">Cancel</button>
@@ -408,6 +482,49 @@ $cameras = $camera->read();
         </div>
     </div>
 
+    <!-- Detection Zones Modal -->
+    <div class="modal fade" id="zonesModal" tabindex="-1">
+        <div class="modal-dialog modal-xl">
+            <div class="modal-content">
+                <div class="modal-header">
+                    <h5 class="modal-title">Detection Zones</h5>
+                    <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
+                </div>
+                <form method="POST" onsubmit="return submitZones()">
+                    <div class="modal-body">
+                        <input type="hidden" name="action" value="save_zones">
+                        <input type="hidden" name="camera_id" id="zones_camera_id">
+                        <input type="hidden" name="polygons" id="zones_polygons">
+                        
+                        <p class="text-muted">
+                            Click on the image to outline the area where attendance should be taken, e.g. the doorway.
+                            Only these zones are scanned for faces; leave empty to scan the full frame.
+                        </p>
+                        
+                        <div class="zone-editor mb-3">
+                            <img id="zones_image" alt="Camera snapshot">
+                            <canvas id="zones_canvas"></canvas>
+                        </div>
+                        
+                        <button type="button" class="btn btn-sm btn-outline-primary" onclick="finishZone()">
+                            <i class="fas fa-check me-1"></i>Finish Zone
+                        </button>
+                        <button type="button" class="btn btn-sm btn-outline-secondary" onclick="undoZonePoint()">
+                            <i class="fas fa-undo me-1"></i>Undo
+                        </button>
+                        <button type="button" class="btn btn-sm btn-outline-danger" onclick="clearZones()">
+                            <i class="fas fa-eraser me-1"></i>Clear All
+                        </button>
+                    </div>
+                    <div class="modal-footer">
+                        <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">Cancel</button>
+                        <button type="submit" class="btn btn-primary">Save Zones</button>
+                    </div>
+                </form>
+            </div>
+        </div>
+    </div>
+
     <!-- Delete Confirmation Modal -->
     <div class="modal fade" id="deleteCameraModal" tabindex="-1">
         <div class="modal-dialog">
@@ -433,17 +550,118 @@ $cameras = $camera->read();
 
     <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js"></script>
     <script>
-        function editCamera(camera) {
+        function editCamera(camera, gradeIds) {
             document.getElementById('edit_camera_id').value = camera.id;
             document.getElementById('edit_name').value = camera.name;
             document.getElementById('edit_location').value = camera.location;
             document.getElementById('edit_rtsp_url').value = camera.rtsp_url;
             document.getElementById('edit_username').value = camera.username;
             document.getElementById('edit_is_active').checked = camera.is_active == 1;
+            Array.from(document.getElementById('edit_grade_ids').options).forEach(function(option) {
+                option.selected = gradeIds.indexOf(parseInt(option.value)) !== -1;
+            });
             
             new bootstrap.Modal(document.getElementById('editCameraModal')).show();
         }
         
+        // Zones are lists of [x, y] points normalised to the frame size
+        let zonePolygons = [];
+        let zoneCurrent = [];
+        
+        function editZones(cameraId, polygons) {
+            document.getElementById('zones_camera_id').value = cameraId;
+            document.getElementById('zones_image').src = 'http://localhost:5000/video_feed/' + cameraId;
+            zonePolygons = polygons.map(polygon => polygon.slice());
+            zoneCurrent = [];
+            
+            const modal = document.getElementById('zonesModal');
+            modal.addEventListener('shown.bs.modal', drawZones, { once: true });
+            new bootstrap.Modal(modal).show();
+        }
+        
+        function drawZones() {
+            const canvas = document.getElementById('zones_canvas');
+            canvas.width = canvas.clientWidth;
+            canvas.height = canvas.clientHeight;
+            const ctx = canvas.getContext('2d');
+            ctx.clearRect(0, 0, canvas.width, canvas.height);
+            
+            const trace = (points, close) => {
+                ctx.beginPath();
+                points.forEach(([x, y], i) => {
+                    if (i === 0) {
+                        ctx.moveTo(x * canvas.width, y * canvas.height);
+                    } else {
+                        ctx.lineTo(x * canvas.width, y * canvas.height);
+                    }
+                });
+                if (close) {
+                    ctx.closePath();
+                }
+            };
+            
+            ctx.lineWidth = 2;
+            ctx.strokeStyle = '#ffc107';
+            ctx.fillStyle = 'rgba(255, 193, 7, 0.25)';
+            zonePolygons.forEach(polygon => {
+                trace(polygon, true);
+                ctx.fill();
+                ctx.stroke();
+            });
+            
+            if (zoneCurrent.length) {
+                ctx.setLineDash([6, 4]);
+                trace(zoneCurrent, false);
+                ctx.stroke();
+                ctx.setLineDash([]);
+                ctx.fillStyle = '#ffc107';
+                zoneCurrent.forEach(([x, y]) => {
+                    ctx.fillRect(x * canvas.width - 3, y * canvas.height - 3, 6, 6);
+                });
+            }
+        }
+        
+        document.getElementById('zones_canvas').addEventListener('click', function(event) {
+            const rect = this.getBoundingClientRect();
+            zoneCurrent.push([
+                (event.clientX - rect.left) / rect.width,
+                (event.clientY - rect.top) / rect.height
+            ]);
+            drawZones();
+        });
+        
+        // The live stream sets the editor's size once its first frame arrives
+        new ResizeObserver(drawZones).observe(document.getElementById('zones_image'));
+        
+        function finishZone() {
+            if (zoneCurrent.length >= 3) {
+                zonePolygons.push(zoneCurrent);
+            }
+            zoneCurrent = [];
+            drawZones();
+        }
+        
+        function undoZonePoint() {
+            if (zoneCurrent.length) {
+                zoneCurrent.pop();
+            } else if (zonePolygons.length) {
+                zoneCurrent = zonePolygons.pop();
+            }
+            drawZones();
+        }
+        
+        function clearZones() {
+            zonePolygons = [];
+            zoneCurrent = [];
+            drawZones();
+        }
+        
+        function submitZones() {
+            finishZone();
+            document.getElementById('zones_polygons').value = JSON.stringify(zonePolygons);
+            return true;
+        }
+        
         function deleteCamera(cameraId) {
             document.getElementById('delete_camera_id').value = cameraId;
             new bootstrap.Modal(document.getElementById('deleteCameraModal')).show();
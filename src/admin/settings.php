@@ -33,6 +33,7 @@ if ($_SERVER['REQUEST_METHOD'] == 'POST') {
                         is_active = VALUES(is_active)
                     ");
                     $stmt->execute([$provider, $api_key, $api_secret, $sender_id, $is_active]);
+                    Utils::notifyDetectionService('/api/refresh_sms_config');
                     $success_message = "SMS configuration updated successfully!";
                 } catch (Exception $e) {
                     $error_message = "Failed to update SMS configuration: " . $e->getMessage();
@@ -66,6 +67,7 @@ if ($_SERVER['REQUEST_METHOD'] == 'POST') {
                         $stmt->execute([$key, $value]);
                     }
                     
+                    Utils::notifyDetectionService('/api/refresh_schedule');
                     $success_message = "System settings updated successfully!";
                 } catch (Exception $e) {
                     $error_message = "Failed to update system settings: " . $e->getMessage();
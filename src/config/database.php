@@ -54,6 +54,13 @@ class Utils {
         return password_verify($password, $hash);
     }
     
+    public static function notifyDetectionService($path) {
+        // Best effort: the face detection service also reloads its caches periodically
+        $base_url = getenv('FACE_DETECTION_URL') ?: 'http://face_detection:5000';
+        $context = stream_context_create(array('http' => array('timeout' => 2)));
+        return @file_get_contents(rtrim($base_url, '/') . $path, false, $context) !== false;
+    }
+    
     public static function formatDate($date) {
         return date('Y-m-d H:i:s', strtotime($date));
     }
@@ -1,17 +1,32 @@
 import cv2
-import face_recognition
 import numpy as np
 import json
-import pymysql
 import redis
 import os
 import time
-import requests
 from datetime import datetime
-import base64
-from flask import Flask, render_template, Response, jsonify
+from flask import Flask, render_template, Response, jsonify, request
 import threading
 import queue
+from concurrent.futures import ThreadPoolExecutor
+from gallery import FaceGallery, FACE_MODEL, ENCODING_DIM, blob_to_encoding
+from gallery_snapshot import GallerySnapshotStore, gallery_db_state, row_digest
+from face_index import measure_recall
+from db_pool import ConnectionPool
+from schedule_cache import DetectionScheduleCache
+from attendance_writer import AttendanceWriter
+from sms_dispatcher import SmsDispatcher
+from capture import FrameGrabber, RateMeter
+from inference import InferenceEngine
+from frame_store import FrameStore
+from motion import MotionGate
+from tracker import FaceTracker
+from sampling import AdaptiveSampler
+from encoding_scheduler import EncodingScheduler
+from detectors import detector_spec_for_camera
+from roi import DetectionZone
+from quality import QualityGate
+from camera_config import camera_setting
 
 app = Flask(__name__)
 
@@ -25,121 +40,402 @@ class FaceDetectionSystem:
             'charset': 'utf8mb4'
         }
         
+        # One bounded pool shared by all camera threads and Flask handlers
+        self.db_pool = ConnectionPool(
+            self.db_config,
+            max_size=int(os.getenv('DB_POOL_SIZE', 10)),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', 10))
+        )
+        
         self.redis_client = redis.Redis(
             host=os.getenv('REDIS_HOST', 'localhost'),
             port=int(os.getenv('REDIS_PORT', 6379)),
             decode_responses=True
         )
         
-        self.known_face_encodings = []
-        self.known_face_names = []
-        self.known_face_roll_numbers = []
+        # Latest JPEG per camera for /video_feed, optionally mirrored to Redis as raw bytes
+        frame_redis_client = None
+        if os.getenv('FRAME_STORE_REDIS', 'false').lower() == 'true':
+            frame_redis_client = redis.Redis(
+                host=os.getenv('REDIS_HOST', 'localhost'),
+                port=int(os.getenv('REDIS_PORT', 6379))
+            )
+        self.frame_store = FrameStore(frame_redis_client)
+        
+        # Schedule and global flag answered from memory, reloaded on pub/sub invalidation
+        self.schedule_cache = DetectionScheduleCache(
+            self.db_pool,
+            self.redis_client,
+            max_age=int(os.getenv('SCHEDULE_CACHE_MAX_AGE', 300))
+        )
+        
+        self.gallery = FaceGallery([], [], [], [])
         self.cameras = []
+        self.camera_stats = {}
+        self.camera_detectors = {}
+        self.camera_zones = {}
+        self.camera_grades = {}
+        self.partition_matches = 0
+        self.fallback_matches = 0
+        self.refine_margin = float(os.getenv('GALLERY_REFINE_MARGIN', 0.08))
+        self.refined_faces = 0
+        self.frame_ring_slots = int(os.getenv('FRAME_RING_SLOTS', 4))
         self.attendance_threshold = 0.6
         
+        # CPU-bound detection and encoding run on worker processes sized to the host
+        workers = os.getenv('INFERENCE_WORKERS')
+        self.inference = InferenceEngine(workers=int(workers) if workers else None)
+        
+        # Face chips from all cameras are encoded and recognised together in micro-batches
+        self.encoding_scheduler = EncodingScheduler(
+            self.inference, self.recognize_faces,
+            max_batch=int(os.getenv('ENCODING_MAX_BATCH', 16)),
+            max_latency=float(os.getenv('ENCODING_MAX_LATENCY_MS', 20)) / 1000.0
+        )
+        
+        # Memory-mapped gallery snapshots make restarts independent of the students table size
+        self.gallery_snapshots = None
+        if os.getenv('GALLERY_SNAPSHOT', 'true').lower() == 'true':
+            self.gallery_snapshots = GallerySnapshotStore(
+                os.getenv('GALLERY_SNAPSHOT_DIR', os.getenv('FACE_MODELS_DIR', 'face_models'))
+            )
+        
+        # Refreshes run one at a time on a background thread and swap the gallery in whole
+        self.gallery_refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gallery-refresh')
+        self.last_gallery_refresh = None
+        
         # Load face encodings and camera configurations
         self.load_face_encodings()
         self.load_cameras()
         
-        # Queue for detected faces
-        self.detection_queue = queue.Queue()
+        # SMS delivery runs on its own workers from a durable Redis stream outbox
+        self.sms_dispatcher = SmsDispatcher(
+            self.db_pool,
+            self.redis_client,
+            workers=int(os.getenv('SMS_WORKERS', 4)),
+            rate_per_second=float(os.getenv('SMS_RATE_LIMIT', 5)),
+            max_attempts=int(os.getenv('SMS_MAX_ATTEMPTS', 5)),
+            timeout=float(os.getenv('SMS_TIMEOUT', 10))
+        )
+        
+        # Queue for detected faces, drained in batches by the attendance writer
+        self.detection_queue = queue.Queue(maxsize=int(os.getenv('ATTENDANCE_QUEUE_SIZE', 1000)))
+        self.attendance_writer = AttendanceWriter(
+            self.db_pool,
+            self.detection_queue,
+            self.on_attendance_saved,
+            batch_size=int(os.getenv('ATTENDANCE_BATCH_SIZE', 50)),
+            flush_interval=float(os.getenv('ATTENDANCE_FLUSH_INTERVAL', 0.5)),
+            workers=int(os.getenv('ATTENDANCE_WRITERS', 1))
+        )
         
     def load_face_encodings(self):
-        """Load face encodings from database"""
+        """Full gallery load at startup; on error the current gallery stays in place"""
         try:
-            connection = pymysql.connect(**self.db_config)
+            return self.reload_gallery()
+        except Exception as e:
+            print(f"Error loading face encodings: {e}")
+            return None
+    
+    def refresh_face_encodings(self, incremental=True):
+        """Rebuild the gallery off the camera threads and report what changed"""
+        try:
+            report = self.update_gallery() if incremental else self.reload_gallery()
+        except Exception as e:
+            print(f"Error refreshing face encodings: {e}")
+            report = {'mode': 'incremental' if incremental else 'full', 'error': str(e)}
+        report['finished_at'] = datetime.now().isoformat()
+        self.last_gallery_refresh = report
+        return report
+    
+    def publish_gallery(self, gallery):
+        """Swap a fully built gallery in; camera threads pick it up on their next read of self.gallery"""
+        gallery.attach_index(self.gallery.index)
+        self.build_partitions(gallery)
+        self.gallery = gallery
+        if gallery.index.kind != 'exact':
+            print(f"Face index recall: {measure_recall(gallery.index)}")
+    
+    def reload_gallery(self):
+        """Load every face encoding, from the on-disk snapshot while it matches the database"""
+        started = time.time()
+        previous = self.gallery
+        state = None
+        gallery = None
+        source = 'snapshot'
+        
+        if self.gallery_snapshots is not None:
+            try:
+                with self.db_pool.connection() as connection:
+                    state = gallery_db_state(connection)
+            except Exception as e:
+                # Database unreachable: serve the newest snapshot rather than no one
+                print(f"Error reading gallery state, using latest snapshot: {e}")
+            gallery = self.gallery_snapshots.load(state)
+            if gallery is not None and state is not None:
+                try:
+                    with self.db_pool.connection() as connection:
+                        gallery.fill_contacts(self.fetch_contacts(connection))
+                except Exception as e:
+                    print(f"Error loading parent contacts, looking them up per attendance: {e}")
+        
+        if gallery is None:
+            gallery = self.fetch_gallery()
+            source = 'database'
+            if self.gallery_snapshots is not None and state is not None:
+                self.gallery_snapshots.save(gallery, state)
+        
+        # Build the new gallery completely before publishing it to camera threads
+        self.publish_gallery(gallery)
+        elapsed = time.time() - started
+        print(f"Loaded {len(gallery)} face encodings from {source} in {elapsed:.2f}s ({gallery.index.kind} index)")
+        return {
+            'mode': 'full',
+            'source': source,
+            'upserted': gallery.student_count(),
+            'removed': int(np.setdiff1d(previous.student_ids, gallery.student_ids).size),
+            'total': gallery.student_count(),
+            'rows': len(gallery),
+            'elapsed_ms': round(elapsed * 1000.0, 1)
+        }
+    
+    def update_gallery(self):
+        """Apply only the students changed since the gallery version, falling back to a full reload"""
+        current = self.gallery
+        if current.version is None:
+            return self.reload_gallery()
+        
+        started = time.time()
+        with self.db_pool.connection() as connection:
             with connection.cursor() as cursor:
+                # Deactivated, cleared or re-modelled rows come back too, so they can be dropped
                 cursor.execute("""
-                    SELECT id, roll_number, name, face_encoding 
+                    SELECT id, roll_number, name, face_embedding, face_encoding, parent_name, parent_phone, 
+                           grade, UNIX_TIMESTAMP(updated_at), is_active, face_model 
                     FROM students 
-                    WHERE face_encoding IS NOT NULL AND is_active = 1
-                """)
+                    WHERE updated_at >= FROM_UNIXTIME(%s)
+                """, (current.version,))
                 
+                rows = cursor.fetchall()
+            
+            # Rows at exactly the gallery version were fetched last time; skip them unless their content changed
+            rows = [row for row in rows
+                    if not (row[8] is not None and float(row[8]) == current.version
+                            and current.version_rows.get(row[0]) == row_digest(row))]
+            eligible = [row for row in rows if row[9] and (
+                (row[3] is not None and row[10] == FACE_MODEL) or (row[3] is None and row[4] is not None))]
+            changed = self.decode_gallery_rows(eligible)
+            samples = self.fetch_samples(connection, changed[1]) if changed[1] else []
+            state = gallery_db_state(connection)
+        
+        changed_ids = {row[0] for row in rows}
+        known_ids = set(current.student_ids.tolist()) | current.rejected_ids
+        removed_ids = [student_id for student_id in changed_ids if student_id in known_ids]
+        rejected_ids = (current.rejected_ids - changed_ids) | set(changed[8])
+        
+        if not changed[1] and not removed_ids:
+            # Nothing the gallery holds has changed (e.g. only ineligible rows were touched)
+            gallery = current
+        else:
+            version = max([current.version] + [float(row[8]) for row in rows if row[8] is not None])
+            changes = FaceGallery.from_students(*changed[:7], samples=samples)
+            gallery = current.with_changes(removed_ids, changes, version=version)
+            gallery.version_rows = dict(current.version_rows) if version == current.version else {}
+            gallery.version_rows.update(
+                (row[0], row_digest(row)) for row in rows if row[8] is not None and float(row[8]) == version
+            )
+            gallery.rejected_ids = frozenset(rejected_ids)
+        
+        # Hard deletes leave no updated_at behind; a count mismatch means the delta missed something
+        if gallery.student_count() + len(gallery.rejected_ids) != state['count']:
+            print(f"Incremental gallery has {gallery.student_count()} students ({len(gallery.rejected_ids)} "
+                  f"undecodable) but the database has {state['count']}, reloading")
+            return self.reload_gallery()
+        
+        if gallery is not current:
+            self.publish_gallery(gallery)
+            if self.gallery_snapshots is not None:
+                self.gallery_snapshots.save(gallery, state)
+        
+        elapsed = time.time() - started
+        upserted = len(changed[1])
+        removed = int(np.setdiff1d(current.student_ids, gallery.student_ids).size)
+        if gallery is not current:
+            print(f"Updated {upserted} face encodings in {elapsed:.2f}s, {gallery.student_count()} in gallery")
+        return {
+            'mode': 'incremental',
+            'source': 'database',
+            'upserted': upserted,
+            'removed': removed,
+            'total': gallery.student_count(),
+            'rows': len(gallery),
+            'elapsed_ms': round(elapsed * 1000.0, 1)
+        }
+    
+    def fetch_gallery(self):
+        """Build a gallery from the students table"""
+        with self.db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                # JSON is only transferred for rows not yet migrated to binary encodings
+                cursor.execute("""
+                    SELECT id, roll_number, name, face_embedding, face_encoding, parent_name, parent_phone, 
+                           grade, UNIX_TIMESTAMP(updated_at), is_active, face_model 
+                    FROM students 
+                    WHERE is_active = 1 
+                      AND ((face_embedding IS NOT NULL AND face_model = %s) 
+                           OR (face_embedding IS NULL AND face_encoding IS NOT NULL))
+                """, (FACE_MODEL,))
+            
                 students = cursor.fetchall()
-                
-                for student in students:
-                    student_id, roll_number, name, face_encoding_str = student
-                    
-                    if face_encoding_str:
-                        try:
-                            face_encoding = json.loads(face_encoding_str)
-                            self.known_face_encodings.append(np.array(face_encoding))
-                            self.known_face_names.append(name)
-                            self.known_face_roll_numbers.append(roll_number)
-                        except (json.JSONDecodeError, ValueError) as e:
-                            print(f"Error loading face encoding for {name}: {e}")
-                            
-            connection.close()
-            print(f"Loaded {len(self.known_face_encodings)} face encodings")
             
+            samples = self.fetch_samples(connection)
+        
+        encodings, student_ids, names, roll_numbers, parent_names, parent_phones, grades, legacy, rejected = \
+            self.decode_gallery_rows(students)
+        if legacy:
+            print(f"{legacy} face encodings are still JSON text; run face_detection/migrate_face_encodings.py")
+        
+        version = max((float(student[8]) for student in students if student[8] is not None), default=None)
+        gallery = FaceGallery.from_students(encodings, student_ids, names, roll_numbers, parent_names, parent_phones,
+                                            grades, samples=samples, version=version)
+        # Same columns as the incremental query, so their row digests compare equal
+        gallery.version_rows = {
+            student[0]: row_digest(student) for student in students
+            if student[8] is not None and float(student[8]) == version
+        }
+        gallery.rejected_ids = frozenset(rejected)
+        return gallery
+    
+    def fetch_contacts(self, connection):
+        """Parent (name, phone) per active student, kept out of gallery snapshots"""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id, parent_name, parent_phone FROM students WHERE is_active = 1")
+            return {student_id: (parent_name, parent_phone)
+                    for student_id, parent_name, parent_phone in cursor.fetchall()}
+    
+    def fetch_samples(self, connection, student_ids=None):
+        """Enrollment samples as (student_id, encoding, is_prototype), for all active students or the given ones"""
+        query = """
+            SELECT s.student_id, s.embedding, s.is_prototype 
+            FROM student_face_samples s 
+            JOIN students st ON st.id = s.student_id 
+            WHERE st.is_active = 1 AND st.face_embedding IS NOT NULL AND st.face_model = %s AND s.face_model = %s
+        """
+        params = [FACE_MODEL, FACE_MODEL]
+        if student_ids is not None:
+            query += " AND s.student_id IN (" + ", ".join(["%s"] * len(student_ids)) + ")"
+            params.extend(student_ids)
+        
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(query + " ORDER BY s.student_id, s.id", params)
+                rows = cursor.fetchall()
         except Exception as e:
-            print(f"Error loading face encodings: {e}")
+            # student_face_samples not migrated yet: every student keeps a single encoding
+            print(f"Error loading face samples: {e}")
+            return []
+        
+        samples = []
+        for student_id, embedding, is_prototype in rows:
+            try:
+                samples.append((student_id, blob_to_encoding(embedding), bool(is_prototype)))
+            except ValueError as e:
+                print(f"Error loading face sample for student ID {student_id}: {e}")
+        return samples
+    
+    def decode_gallery_rows(self, students):
+        """Decode (id, roll_number, name, face_embedding, face_encoding, parent_name, parent_phone, grade, ...) rows"""
+        # Every encoding is copied straight from its BLOB into one preallocated matrix
+        encodings = np.empty((len(students), ENCODING_DIM), dtype=np.float32)
+        count = 0
+        legacy = 0
+        student_ids = []
+        names = []
+        roll_numbers = []
+        parent_names = []
+        parent_phones = []
+        grades = []
+        rejected = []
+            
+        for student in students:
+            student_id, roll_number, name, face_embedding, face_encoding_str, parent_name, parent_phone, grade = \
+                student[:8]
+            
+            try:
+                if face_embedding is not None:
+                    encodings[count] = blob_to_encoding(face_embedding)
+                else:
+                    face_encoding = json.loads(face_encoding_str)
+                    if len(face_encoding) != ENCODING_DIM:
+                        raise ValueError(f"expected {ENCODING_DIM} values, got {len(face_encoding)}")
+                    encodings[count] = face_encoding
+                    legacy += 1
+                count += 1
+                student_ids.append(student_id)
+                names.append(name)
+                roll_numbers.append(roll_number)
+                parent_names.append(parent_name)
+                parent_phones.append(parent_phone)
+                grades.append(grade)
+            except (json.JSONDecodeError, ValueError, TypeError) as e:
+                print(f"Error loading face encoding for {name}: {e}")
+                rejected.append(student_id)
+        
+        return (encodings[:count], student_ids, names, roll_numbers, parent_names, parent_phones, grades,
+                legacy, rejected)
     
     def load_cameras(self):
         """Load camera configurations from database"""
         try:
-            connection = pymysql.connect(**self.db_config)
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT id, name, rtsp_url, username, password, location 
-                    FROM cameras 
-                    WHERE is_active = 1
-                """)
+            with self.db_pool.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT id, name, rtsp_url, username, password, location 
+                        FROM cameras 
+                        WHERE is_active = 1
+                    """)
                 
-                self.cameras = cursor.fetchall()
-            connection.close()
+                    self.cameras = cursor.fetchall()
             print(f"Loaded {len(self.cameras)} cameras")
             
         except Exception as e:
             print(f"Error loading cameras: {e}")
+        
+        self.load_camera_zones()
+        self.load_camera_grades()
+    
+    def load_camera_zones(self):
+        """Load region-of-interest polygons per camera from database"""
+        try:
+            with self.db_pool.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT camera_id, polygon 
+                        FROM camera_rois 
+                        WHERE is_active = 1
+                        ORDER BY camera_id, id
+                    """)
+                
+                    rows = cursor.fetchall()
+            
+            polygons = {}
+            for camera_id, polygon in rows:
+                polygons.setdefault(camera_id, []).append(polygon)
+            
+            # Camera threads pick up the new zones on their next sampled frame
+            self.camera_zones = {
+                camera_id: DetectionZone.from_rows(camera_polygons)
+                for camera_id, camera_polygons in polygons.items()
+            }
+            print(f"Loaded detection zones for {len(self.camera_zones)} cameras")
+            
+        except Exception as e:
+            print(f"Error loading camera zones: {e}")
     
     def is_detection_active(self, camera_id):
         """Check if face detection is active for a camera based on schedule"""
         try:
-            connection = pymysql.connect(**self.db_config)
-            with connection.cursor() as cursor:
-                # First check if detection is globally enabled
-                cursor.execute("""
-                    SELECT setting_value FROM system_settings 
-                    WHERE setting_key = 'detection_enabled'
-                """)
-                result = cursor.fetchone()
-                if not result or result[0] != 'true':
-                    connection.close()
-                    return False
-                
-                # Check if there's a schedule for this camera
-                current_day = datetime.now().strftime('%A').lower()
-                current_time = datetime.now().strftime('%H:%M:%S')
-                
-                cursor.execute("""
-                    SELECT COUNT(*) FROM detection_schedule 
-                    WHERE camera_id = %s AND day_of_week = %s AND is_active = 1
-                    AND %s BETWEEN start_time AND end_time
-                """, (camera_id, current_day, current_time))
-                
-                result = cursor.fetchone()
-                has_schedule = result[0] > 0
-                
-                # If no schedule exists, detection is active by default
-                # If schedule exists, only active during scheduled times
-                if not has_schedule:
-                    # Check if there are any schedules for this camera
-                    cursor.execute("""
-                        SELECT COUNT(*) FROM detection_schedule 
-                        WHERE camera_id = %s
-                    """, (camera_id,))
-                    result = cursor.fetchone()
-                    has_any_schedule = result[0] > 0
-                    
-                    # If no schedules exist at all, detection is active
-                    # If schedules exist but none match current time, detection is inactive
-                    connection.close()
-                    return not has_any_schedule
-                else:
-                    connection.close()
-                    return True
-                    
+            return self.schedule_cache.is_active(camera_id)
         except Exception as e:
             print(f"Error checking detection schedule: {e}")
             return True  # Default to active if error
@@ -154,61 +450,168 @@ class FaceDetectionSystem:
                 rtsp_url = f'rtsp://{username}:{password}@{rtsp_url}'
         return rtsp_url
     
-    def detect_faces_in_frame(self, frame):
-        """Detect faces in a frame and return face locations and encodings"""
-        # Resize frame for faster processing
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+    def detect_faces_in_frame(self, frame, camera_id=None, frame_ref=None, regions=None, scale=0.25):
+        """Detect faces in a frame and return their locations; encoding goes through the encoding scheduler"""
+        # Resizing and detection run in the inference worker pool with the
+        # detector backend chosen for this camera
+        detector = self.camera_detectors.get(camera_id)
+        face_locations = self.inference.detect_faces(
+            camera_id, frame, scale=scale, frame_ref=frame_ref, regions=regions, detector=detector
+        )
         
-        # Find face locations and encodings
-        face_locations = face_recognition.face_locations(rgb_small_frame)
-        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+        # Faces outside the camera's detection zone (passers-by) are dropped
+        zone = self.camera_zones.get(camera_id)
+        if zone:
+            inside = [zone.inside(location, scale, frame.shape) for location in face_locations]
+            face_locations = [location for location, keep in zip(face_locations, inside) if keep]
         
-        return face_locations, face_encodings
+        return face_locations
     
-    def recognize_faces(self, face_encodings):
-        """Recognize faces and return names and confidence scores"""
-        face_names = []
-        face_confidences = []
+    def track_faces(self, tracker, camera_id, frame, frame_ref=None, regions=None, scale=0.25, quality=None):
+        """Detect faces and associate them with tracks; returns face locations and settled (match, confidence) events"""
+        face_locations = self.detect_faces_in_frame(frame, camera_id, frame_ref, regions, scale)
         
-        for face_encoding in face_encodings:
-            if len(self.known_face_encodings) == 0:
-                face_names.append("Unknown")
-                face_confidences.append(0.0)
-                continue
-                
-            # Compare face encoding with known faces
-            matches = face_recognition.compare_faces(
-                self.known_face_encodings, 
-                face_encoding, 
-                tolerance=self.attendance_threshold
+        scanned = None
+        if regions is not None:
+            scanned = [(top * scale, right * scale, bottom * scale, left * scale) for left, top, right, bottom in regions]
+        tracks = tracker.update(face_locations, scanned)
+        
+        # Encode only the tracks whose identity is not settled yet
+        pending = [track for track in tracks if tracker.needs_encoding(track)]
+        if pending and quality is not None:
+            # Junk crops cast no vote; the track is retried on a later, better frame
+            keep = quality.filter(frame, [track.box for track in pending], scale)
+            pending = [track for track, ok in zip(pending, keep) if ok]
+        if pending:
+            _, face_confidences, face_matches = self.encoding_scheduler.encode_and_match(
+                camera_id, frame, [track.box for track in pending], scale
             )
+            for track, confidence, match in zip(pending, face_confidences, face_matches):
+                student_id = int(match[0].student_ids[match[1]]) if match is not None else None
+                tracker.observe(track, student_id, confidence, match)
+        
+        events = []
+        for track in tracks:
+            event = tracker.take_event(track, self.attendance_threshold)
+            if event is not None:
+                events.append(event)
+        return face_locations, events
+    
+    def load_camera_grades(self):
+        """Load the grades each camera can see from database"""
+        try:
+            with self.db_pool.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT cg.camera_id, g.name 
+                        FROM camera_grades cg 
+                        JOIN grades g ON g.id = cg.grade_id 
+                        WHERE g.is_active = 1
+                    """)
+                
+                    rows = cursor.fetchall()
             
-            face_distances = face_recognition.face_distance(
-                self.known_face_encodings, 
-                face_encoding
-            )
+            camera_grades = {}
+            for camera_id, grade in rows:
+                camera_grades.setdefault(camera_id, set()).add(grade)
+            
+            # Partitions are built before cameras can look them up
+            self.build_partitions(self.gallery, camera_grades)
+            self.camera_grades = {camera_id: frozenset(grades) for camera_id, grades in camera_grades.items()}
+            print(f"Loaded gallery partitions for {len(self.camera_grades)} cameras")
+            
+        except Exception as e:
+            print(f"Error loading camera grades: {e}")
+    
+    def build_partitions(self, gallery, camera_grades=None):
+        """Precompute the gallery partition of every camera linked to grades"""
+        for grades in (camera_grades if camera_grades is not None else self.camera_grades).values():
+            gallery.partition(grades)
+    
+    def match_faces(self, gallery, face_encodings, camera_ids):
+        """Best (gallery, index, distance) per face, searching each camera's partition before the whole gallery"""
+        count = len(face_encodings)
+        matched_galleries = [gallery] * count
+        best_indexes = np.full(count, -1, dtype=np.intp)
+        best_distances = np.full(count, np.inf, dtype=np.float32)
+        if count == 0:
+            return matched_galleries, best_indexes, best_distances
+        
+        face_encodings = np.asarray(face_encodings, dtype=np.float32).reshape(count, ENCODING_DIM)
+        faces_by_camera = {}
+        for row, camera_id in enumerate(camera_ids if camera_ids is not None else [None] * count):
+            faces_by_camera.setdefault(camera_id, []).append(row)
+        
+        for camera_id, rows in faces_by_camera.items():
+            grades = self.camera_grades.get(camera_id)
+            searches = [gallery]
+            if grades:
+                searches = [gallery.partition(grades)]
+                if camera_setting('GALLERY_PARTITION_FALLBACK', camera_id, True, cast=bool):
+                    searches.append(gallery)
             
-            best_match_index = np.argmin(face_distances)
+            pending = rows
+            for target in searches:
+                indexes, distances = target.match(face_encodings[pending])
+                # Close calls between prototypes are settled against the students' full samples
+                indexes, distances, refined = target.refine(
+                    face_encodings[pending], indexes, distances, self.attendance_threshold, self.refine_margin
+                )
+                self.refined_faces += refined
+                for row, index, distance in zip(pending, indexes, distances):
+                    if index >= 0 and distance < best_distances[row]:
+                        matched_galleries[row] = target
+                        best_indexes[row] = index
+                        best_distances[row] = distance
+                # Only faces the partition could not place fall through to the whole school
+                pending = [row for row in pending if best_distances[row] > self.attendance_threshold]
+                if not pending:
+                    break
             
-            if matches[best_match_index]:
-                confidence = 1 - face_distances[best_match_index]
-                face_names.append(self.known_face_names[best_match_index])
-                face_confidences.append(confidence)
+            if grades:
+                partition_hits = sum(1 for row in rows if matched_galleries[row] is not gallery
+                                     and best_distances[row] <= self.attendance_threshold)
+                fallback_hits = sum(1 for row in rows if matched_galleries[row] is gallery
+                                    and best_distances[row] <= self.attendance_threshold)
+                self.partition_matches += partition_hits
+                self.fallback_matches += fallback_hits
+        
+        return matched_galleries, best_indexes, best_distances
+    
+    def recognize_faces(self, face_encodings, camera_ids=None):
+        """Recognize faces and return names, confidence scores and gallery matches"""
+        face_names = []
+        face_confidences = []
+        face_matches = []
+        
+        # Match every face in the batch in one computation per camera partition
+        galleries, best_indexes, best_distances = self.match_faces(self.gallery, face_encodings, camera_ids)
+        
+        for gallery, best_match_index, distance in zip(galleries, best_indexes, best_distances):
+            if best_match_index >= 0 and distance <= self.attendance_threshold:
+                face_names.append(gallery.names[best_match_index])
+                face_confidences.append(float(1 - distance))
+                face_matches.append((gallery, int(best_match_index)))
             else:
                 face_names.append("Unknown")
                 face_confidences.append(0.0)
+                face_matches.append(None)
         
-        return face_names, face_confidences
+        return face_names, face_confidences, face_matches
     
-    def draw_face_boxes(self, frame, face_locations, face_names, face_confidences):
+    def draw_face_boxes(self, frame, face_locations, face_names, face_confidences, scale=0.25):
         """Draw bounding boxes around detected faces"""
         # Scale back up face locations since the frame was scaled down
         for (top, right, bottom, left), name, confidence in zip(face_locations, face_names, face_confidences):
-            top *= 4
-            right *= 4
-            bottom *= 4
-            left *= 4
+            top = int(top / scale)
+            right = int(right / scale)
+            bottom = int(bottom / scale)
+            left = int(left / scale)
+            
+            if not name:
+                # Face skipped by the quality gate: outline only
+                cv2.rectangle(frame, (left, top), (right, bottom), (160, 160, 160), 1)
+                continue
             
             # Draw rectangle around face
             color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
@@ -222,136 +625,59 @@ class FaceDetectionSystem:
         
         return frame
     
-    def save_attendance_record(self, student_id, camera_id, attendance_type, confidence_score, image_path=None):
-        """Save attendance record to database"""
-        try:
-            connection = pymysql.connect(**self.db_config)
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO attendance (student_id, camera_id, attendance_type, confidence_score, image_path)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (student_id, camera_id, attendance_type, confidence_score, image_path))
-                
-                connection.commit()
-                attendance_id = cursor.lastrowid
-                
-                # Get student info for SMS notification
-                cursor.execute("""
-                    SELECT s.name, s.roll_number, s.parent_phone, s.parent_name
-                    FROM students s WHERE s.id = %s
-                """, (student_id,))
-                
-                student_info = cursor.fetchone()
-                
-            connection.close()
-            
-            # Send SMS notification
-            if student_info:
-                self.send_sms_notification(student_info, attendance_type)
-            
-            # Publish to Redis for real-time updates
-            self.redis_client.publish('attendance_updates', json.dumps({
-                'attendance_id': attendance_id,
-                'student_name': student_info[0] if student_info else 'Unknown',
-                'roll_number': student_info[1] if student_info else 'Unknown',
-                'attendance_type': attendance_type,
-                'confidence_score': confidence_score,
-                'timestamp': datetime.now().isoformat()
-            }))
-            
-            return attendance_id
-            
-        except Exception as e:
-            print(f"Error saving attendance record: {e}")
-            return None
+    def save_attendance_record(self, student_id, camera_id, attendance_type, confidence_score, image_path=None, student_info=None):
+        """Queue an attendance record for the batched writer"""
+        return self.attendance_writer.submit(
+            student_id, camera_id, attendance_type, confidence_score, image_path, student_info
+        )
+    
+    def on_attendance_saved(self, attendance_id, event):
+        """Send notifications for an attendance record once its batch is committed"""
+        student_info = event.student_info
+        detected_at = datetime.fromtimestamp(event.queued_at)
+        
+        # Get student info for SMS notification unless the gallery already supplied it
+        if student_info is None:
+            with self.db_pool.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT s.name, s.roll_number, s.parent_phone, s.parent_name
+                        FROM students s WHERE s.id = %s
+                    """, (event.student_id,))
+                    
+                    student_info = cursor.fetchone()
+        
+        # Send SMS notification
+        if student_info:
+            self.send_sms_notification(student_info, event.attendance_type, detected_at)
+        
+        # Publish to Redis for real-time updates
+        self.redis_client.publish('attendance_updates', json.dumps({
+            'attendance_id': attendance_id,
+            'student_name': student_info[0] if student_info else 'Unknown',
+            'roll_number': student_info[1] if student_info else 'Unknown',
+            'attendance_type': event.attendance_type,
+            'confidence_score': event.confidence_score,
+            'timestamp': detected_at.isoformat()
+        }))
     
-    def send_sms_notification(self, student_info, attendance_type):
-        """Send SMS notification to parent"""
+    def send_sms_notification(self, student_info, attendance_type, detected_at=None):
+        """Queue an SMS notification to the parent on the dispatcher outbox"""
         try:
             name, roll_number, parent_phone, parent_name = student_info
             
             if not parent_phone:
                 return
             
-            # Get SMS configuration
-            connection = pymysql.connect(**self.db_config)
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT provider, api_key, api_secret, sender_id 
-                    FROM sms_config 
-                    WHERE is_active = 1 
-                    LIMIT 1
-                """)
-                
-                sms_config = cursor.fetchone()
-            connection.close()
-            
-            if not sms_config:
-                print("No SMS configuration found")
-                return
-            
-            provider, api_key, api_secret, sender_id = sms_config
-            
             # Prepare message
             action = "entered" if attendance_type == "entry" else "left"
-            message = f"Dear {parent_name}, your child {name} (Roll: {roll_number}) has {action} the school at {datetime.now().strftime('%H:%M')}."
+            message = f"Dear {parent_name}, your child {name} (Roll: {roll_number}) has {action} the school at {(detected_at or datetime.now()).strftime('%H:%M')}."
             
-            # Send SMS based on provider
-            if provider.lower() == 'twilio':
-                self.send_twilio_sms(parent_phone, message, api_key, api_secret, sender_id)
-            elif provider.lower() == 'nexmo':
-                self.send_nexmo_sms(parent_phone, message, api_key, api_secret, sender_id)
-            else:
-                print(f"Unsupported SMS provider: {provider}")
+            self.sms_dispatcher.enqueue(parent_phone, message)
                 
         except Exception as e:
             print(f"Error sending SMS notification: {e}")
     
-    def send_twilio_sms(self, phone, message, api_key, api_secret, sender_id):
-        """Send SMS using Twilio"""
-        try:
-            url = f"https://api.twilio.com/2010-04-01/Accounts/{api_key}/Messages.json"
-            
-            data = {
-                'From': sender_id,
-                'To': phone,
-                'Body': message
-            }
-            
-            response = requests.post(url, data=data, auth=(api_key, api_secret))
-            
-            if response.status_code == 201:
-                print(f"SMS sent successfully to {phone}")
-            else:
-                print(f"Failed to send SMS: {response.text}")
-                
-        except Exception as e:
-            print(f"Error sending Twilio SMS: {e}")
-    
-    def send_nexmo_sms(self, phone, message, api_key, api_secret, sender_id):
-        """Send SMS using Nexmo (Vonage)"""
-        try:
-            url = "https://rest.nexmo.com/sms/json"
-            
-            data = {
-                'api_key': api_key,
-                'api_secret': api_secret,
-                'to': phone,
-                'from': sender_id,
-                'text': message
-            }
-            
-            response = requests.post(url, data=data)
-            result = response.json()
-            
-            if result.get('messages', [{}])[0].get('status') == '0':
-                print(f"SMS sent successfully to {phone}")
-            else:
-                print(f"Failed to send SMS: {result}")
-                
-        except Exception as e:
-            print(f"Error sending Nexmo SMS: {e}")
-    
     def process_camera_stream(self, camera_id, rtsp_url, username, password, location):
         """Process camera stream for face detection"""
         try:
@@ -367,81 +693,158 @@ class FaceDetectionSystem:
             
             print(f"Processing camera {camera_id}: {location}")
             
-            frame_count = 0
+            # Capture runs on its own thread so slow analysis never backs up the stream buffer
+            grabber = FrameGrabber(cap, camera_id, slots=self.frame_ring_slots)
+            analysis_meter = RateMeter()
+            motion_gate = MotionGate.for_camera(camera_id)
+            tracker = FaceTracker.for_camera(camera_id)
+            sampler = AdaptiveSampler.for_camera(camera_id)
+            quality_gate = QualityGate.for_camera(camera_id)
+            self.camera_detectors[camera_id] = detector_spec_for_camera(camera_id)
+            self.camera_stats[camera_id] = {
+                'grabber': grabber, 'analysis': analysis_meter, 'motion': motion_gate,
+                'tracker': tracker, 'sampling': sampler, 'quality': quality_gate
+            }
+            grabber.start()
+            
+            scale = sampler.scale
+            frame_seq = 0
             last_attendance_time = {}
+            detection_active = False
+            lease = None
             
             while True:
-                ret, frame = cap.read()
-                if not ret:
-                    print(f"Error reading frame from camera {camera_id}")
-                    break
+                if lease is not None:
+                    lease.release()
+                
+                # Always analyse the newest frame; older ones were already dropped by the grabber.
+                # The frame is a pinned view into the shared memory ring, shared with the
+                # inference workers, overlay drawing and JPEG encoding without copies.
+                lease = grabber.read(frame_seq)
+                if lease is None:
+                    if grabber.finished:
+                        print(f"Camera {camera_id} stream ended")
+                        break
+                    # RTSP stall: the grabber is still inside cap.read(), keep waiting
+                    print(f"Camera {camera_id} stalled, waiting for frames")
+                    continue
+                frame_seq, frame = lease.seq, lease.frame
                 
-                frame_count += 1
+                analysis_meter.tick()
                 
-                # Process every 5th frame to reduce CPU load
-                if frame_count % 5 == 0:
+                # Sampling interval and detection scale adapt to the scene and the CPU budget
+                if sampler.should_sample():
                     # Check if detection is active for this camera
                     detection_active = self.is_detection_active(camera_id)
                     
-                    if detection_active:
-                        # Detect faces
-                        face_locations, face_encodings = self.detect_faces_in_frame(frame)
+                    # Skip detection on static scenes and only scan the regions that changed
+                    moving, scan_regions = True, None
+                    if detection_active and motion_gate is not None:
+                        moving, scan_regions = motion_gate.check(frame)
+                    
+                    # Only the camera's detection zone is scanned
+                    zone = self.camera_zones.get(camera_id)
+                    if detection_active and moving and zone:
+                        scan_regions = zone.regions(frame.shape, scan_regions)
+                        moving = bool(scan_regions)
+                    
+                    face_locations = []
+                    face_names = []
+                    face_confidences = []
+                    
+                    if detection_active and not moving:
+                        sampler.idle()
+                    
+                    if detection_active and moving:
+                        if tracker is not None and sampler.scale != scale:
+                            tracker.rescale(sampler.scale / scale)
+                        scale = sampler.scale
+                        started = time.time()
                         
-                        if face_encodings:
-                            # Recognize faces
-                            face_names, face_confidences = self.recognize_faces(face_encodings)
+                        try:
+                            if tracker is not None:
+                                # Only new or unsettled tracks are encoded; each track yields one event
+                                face_locations, attendance_events = self.track_faces(
+                                    tracker, camera_id, frame, lease.ref, scan_regions, scale, quality_gate
+                                )
+                            else:
+                                # Detect faces
+                                face_locations = self.detect_faces_in_frame(
+                                    frame, camera_id, lease.ref, scan_regions, scale
+                                )
+                                
+                                # Only faces that pass the quality gate are worth an encoding
+                                keep = [True] * len(face_locations)
+                                if quality_gate is not None:
+                                    keep = quality_gate.filter(frame, face_locations, scale)
+                                
+                                # Encode and recognize faces in a batch shared with the other cameras
+                                names, confidences, matches = self.encoding_scheduler.encode_and_match(
+                                    camera_id, frame, [location for location, ok in zip(face_locations, keep) if ok], scale
+                                )
+                                
+                                # Rejected faces are drawn without a label rather than as Unknown
+                                results = iter(zip(names, confidences, matches))
+                                face_names, face_confidences, face_matches = [], [], []
+                                for ok in keep:
+                                    name, confidence, match = next(results) if ok else ("", 0.0, None)
+                                    face_names.append(name)
+                                    face_confidences.append(confidence)
+                                    face_matches.append(match)
+                                attendance_events = [
+                                    (match, confidence) for confidence, match in zip(face_confidences, face_matches)
+                                    if match is not None and confidence > self.attendance_threshold
+                                ]
                             
-                            # Process each detected face
-                            for i, (name, confidence) in enumerate(zip(face_names, face_confidences)):
-                                if name != "Unknown" and confidence > self.attendance_threshold:
-                                    # Get student ID
-                                    student_id = None
-                                    for j, known_name in enumerate(self.known_face_names):
-                                        if known_name == name:
-                                            # Find student ID by name
-                                            try:
-                                                connection = pymysql.connect(**self.db_config)
-                                                with connection.cursor() as cursor:
-                                                    cursor.execute("""
-                                                        SELECT id FROM students 
-                                                        WHERE name = %s AND is_active = 1 
-                                                        LIMIT 1
-                                                    """, (name,))
-                                                    result = cursor.fetchone()
-                                                    if result:
-                                                        student_id = result[0]
-                                                connection.close()
-                                            except Exception as e:
-                                                print(f"Error getting student ID: {e}")
-                                            break
-                                    
-                                    if student_id:
-                                        # Check if we should record attendance
-                                        current_time = time.time()
-                                        last_time = last_attendance_time.get(student_id, 0)
-                                        
-                                        # Only record if more than 30 seconds have passed
-                                        if current_time - last_time > 30:
-                                            # Determine attendance type based on time of day
-                                            current_hour = datetime.now().hour
-                                            attendance_type = "entry" if 6 <= current_hour <= 12 else "exit"
-                                            
-                                            # Save attendance record
-                                            attendance_id = self.save_attendance_record(
-                                                student_id, camera_id, attendance_type, confidence
-                                            )
-                                            
-                                            if attendance_id:
-                                                last_attendance_time[student_id] = current_time
-                                                print(f"Recorded {attendance_type} for {name} (ID: {student_id})")
+                            sampler.record(time.time() - started, face_locations)
+                        except Exception as e:
+                            # A failed frame (e.g. a crashed inference worker) must not end the camera thread
+                            print(f"Error analysing frame from camera {camera_id}: {e}")
+                            face_locations, face_names, face_confidences, attendance_events = [], [], [], []
                         
-                        # Draw face boxes
-                        frame = self.draw_face_boxes(frame, face_locations, face_names, face_confidences)
-                    else:
-                        # Detection is not active, just show the live feed without face detection
-                        face_locations = []
-                        face_names = []
-                        face_confidences = []
+                        # Process each recognised face
+                        for (gallery, index), confidence in attendance_events:
+                            # The gallery row carries the student ID and contact details
+                            name = gallery.names[index]
+                            student_id = int(gallery.student_ids[index])
+                            
+                            # Check if we should record attendance
+                            current_time = time.time()
+                            last_time = last_attendance_time.get(student_id, 0)
+                            
+                            # Only record if more than 30 seconds have passed
+                            if current_time - last_time > 30:
+                                # Determine attendance type based on time of day
+                                current_hour = datetime.now().hour
+                                attendance_type = "entry" if 6 <= current_hour <= 12 else "exit"
+                                
+                                # Queue attendance record for the batched writer
+                                queued = self.save_attendance_record(
+                                    student_id, camera_id, attendance_type, confidence,
+                                    student_info=gallery.student_info(index)
+                                )
+                                
+                                if queued:
+                                    last_attendance_time[student_id] = current_time
+                                    print(f"Queued {attendance_type} for {name} (ID: {student_id})")
+                                else:
+                                    print(f"Attendance queue full, dropped {attendance_type} for {name} (ID: {student_id})")
+                    
+                        if tracker is None:
+                            # Draw face boxes
+                            frame = self.draw_face_boxes(frame, face_locations, face_names, face_confidences, scale)
+                
+                if tracker is not None and detection_active:
+                    # Follow on the clean frame, before any overlay is drawn into it
+                    tracker.follow(frame, scale)
+                
+                zone = self.camera_zones.get(camera_id)
+                if zone and detection_active:
+                    frame = zone.draw(frame)
+                
+                if tracker is not None and detection_active:
+                    # Tracked faces keep their boxes and settled labels between detections
+                    frame = self.draw_face_boxes(frame, *tracker.labels(), scale)
                 
                 # Add camera info to frame
                 cv2.putText(frame, f"Camera: {location}", (10, 30), 
@@ -454,19 +857,66 @@ class FaceDetectionSystem:
                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, status_color, 2)
                 
                 # Store frame for web display
-                self.redis_client.set(f"camera_{camera_id}_frame", 
-                                    base64.b64encode(cv2.imencode('.jpg', frame)[1]).decode())
+                self.frame_store.put(camera_id, cv2.imencode('.jpg', frame)[1].tobytes())
                 
                 # Break on 'q' key press (for testing)
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     break
             
-            cap.release()
+            if lease is not None:
+                lease.release()
+            if grabber.stop():
+                cap.release()
+            else:
+                print(f"Camera {camera_id} capture thread still blocked, leaving the stream open")
             cv2.destroyAllWindows()
             
         except Exception as e:
             print(f"Error processing camera {camera_id}: {e}")
     
+    def get_camera_stats(self):
+        """Return capture and analysis rates per camera"""
+        stats = {}
+        for camera_id, pipeline in list(self.camera_stats.items()):
+            camera = pipeline['grabber'].stats()
+            camera['analysis_fps'] = round(pipeline['analysis'].value(), 2)
+            camera['frames_analysed'] = pipeline['analysis'].count
+            if pipeline.get('motion') is not None:
+                camera['motion'] = pipeline['motion'].stats()
+            if pipeline.get('tracker') is not None:
+                camera['tracker'] = pipeline['tracker'].stats()
+            camera['sampling'] = pipeline['sampling'].stats()
+            if pipeline.get('quality') is not None:
+                camera['quality'] = pipeline['quality'].stats()
+            detector = self.camera_detectors.get(camera_id)
+            if detector is not None:
+                camera['detector'] = dict(detector[1], backend=detector[0])
+            stats[camera_id] = camera
+        return stats
+    
+    def get_gallery_stats(self):
+        """Return gallery size in students, prototype rows and stored samples"""
+        gallery = self.gallery
+        return {
+            'students': gallery.student_count(),
+            'prototypes': len(gallery),
+            'samples': len(gallery.samples) if gallery.samples is not None else 0,
+            'version': gallery.version,
+            'refined_faces': self.refined_faces
+        }
+    
+    def get_partition_stats(self):
+        """Return the partition size per camera and where matches were found"""
+        gallery = self.gallery
+        return {
+            'cameras': {
+                camera_id: {'grades': sorted(grades), 'size': len(gallery.partition(grades)), 'gallery_size': len(gallery)}
+                for camera_id, grades in self.camera_grades.items()
+            },
+            'partition_matches': self.partition_matches,
+            'fallback_matches': self.fallback_matches
+        }
+    
     def start_all_cameras(self):
         """Start processing all cameras in separate threads"""
         threads = []
@@ -483,36 +933,48 @@ class FaceDetectionSystem:
         
         return threads
 
-# Initialize face detection system
-face_system = FaceDetectionSystem()
+# Initialize face detection system (inference workers re-import this module as
+# __mp_main__ and must not start their own copy of the service)
+if __name__ != '__mp_main__':
+    face_system = FaceDetectionSystem()
 
 @app.route('/')
 def index():
     """Main page showing all camera feeds"""
     return render_template('live_view.html', cameras=face_system.cameras)
 
+_placeholder_jpeg = None
+
+def get_placeholder_jpeg():
+    """Return the "No Signal" JPEG, encoded once and reused by every viewer"""
+    global _placeholder_jpeg
+    if _placeholder_jpeg is None:
+        placeholder = np.zeros((480, 640, 3), dtype=np.uint8)
+        cv2.putText(placeholder, "No Signal", (200, 240), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        _placeholder_jpeg = cv2.imencode('.jpg', placeholder)[1].tobytes()
+    return _placeholder_jpeg
+
 @app.route('/video_feed/<int:camera_id>')
 def video_feed(camera_id):
     """Video feed for specific camera"""
     def generate():
+        last_seq = 0
+        frame_bytes = get_placeholder_jpeg()
+        yield (b'--frame\r\n'
+               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
         while True:
             try:
-                # Get frame from Redis
-                frame_data = face_system.redis_client.get(f"camera_{camera_id}_frame")
-                if frame_data:
-                    frame_bytes = base64.b64decode(frame_data)
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                else:
-                    # Send placeholder frame
-                    placeholder = np.zeros((480, 640, 3), dtype=np.uint8)
-                    cv2.putText(placeholder, "No Signal", (200, 240), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
-                    _, buffer = cv2.imencode('.jpg', placeholder)
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+                # Sleep until the camera publishes a newer frame; every viewer shares
+                # the same encoded bytes
+                frame = face_system.frame_store.wait(camera_id, last_seq, timeout=5.0)
+                if frame:
+                    last_seq, _, frame_bytes = frame
                 
-                time.sleep(0.1)  # 10 FPS
+                # On timeout the last frame (or placeholder) is resent as a keep-alive,
+                # which also lets the server notice disconnected viewers
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
             except Exception as e:
                 print(f"Error in video feed: {e}")
                 break
@@ -523,21 +985,19 @@ def video_feed(camera_id):
 def recent_attendance():
     """API endpoint for recent attendance data"""
     try:
-        connection = pymysql.connect(**face_system.db_config)
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT a.id, a.student_id, a.attendance_type, a.detected_at, 
-                       a.confidence_score, s.name, s.roll_number, c.name as camera_name
-                FROM attendance a
-                JOIN students s ON a.student_id = s.id
-                JOIN cameras c ON a.camera_id = c.id
-                ORDER BY a.detected_at DESC
-                LIMIT 10
-            """)
+        with face_system.db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("""
+                    SELECT a.id, a.student_id, a.attendance_type, a.detected_at, 
+                           a.confidence_score, s.name, s.roll_number, c.name as camera_name
+                    FROM attendance a
+                    JOIN students s ON a.student_id = s.id
+                    JOIN cameras c ON a.camera_id = c.id
+                    ORDER BY a.detected_at DESC
+                    LIMIT 10
+                """)
             
-            attendance_data = cursor.fetchall()
-        
-        connection.close()
+                attendance_data = cursor.fetchall()
         
         return jsonify([{
             'id': row[0],
@@ -553,21 +1013,95 @@ def recent_attendance():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/metrics')
+def metrics():
+    """API endpoint for service performance metrics"""
+    return jsonify({
+        'db_pool': face_system.db_pool.stats(),
+        'detection_schedule': face_system.schedule_cache.stats(),
+        'attendance_writer': face_system.attendance_writer.stats(),
+        'sms': face_system.sms_dispatcher.stats(),
+        'cameras': face_system.get_camera_stats(),
+        'inference': face_system.inference.stats(),
+        'encoding': face_system.encoding_scheduler.stats(),
+        'frame_store': face_system.frame_store.stats(),
+        'gallery_snapshot': face_system.gallery_snapshots.stats() if face_system.gallery_snapshots else None,
+        'gallery_refresh': face_system.last_gallery_refresh,
+        'gallery_partitions': face_system.get_partition_stats(),
+        'gallery': face_system.get_gallery_stats()
+    })
+
+@app.route('/api/sampling')
+def sampling():
+    """API endpoint for each camera's current sampling interval, detection scale and achieved fps"""
+    cameras = {}
+    for camera_id, camera in face_system.get_camera_stats().items():
+        cameras[camera_id] = dict(
+            camera['sampling'],
+            capture_fps=camera['capture_fps'],
+            analysis_fps=camera['analysis_fps']
+        )
+    return jsonify(cameras)
+
 @app.route('/api/refresh_faces')
 def refresh_faces():
-    """API endpoint to refresh face encodings"""
-    face_system.load_face_encodings()
-    return jsonify({'message': 'Face encodings refreshed successfully'})
+    """API endpoint to refresh face encodings: ?mode=incremental (default) or full, ?wait=false to return at once"""
+    incremental = request.args.get('mode', 'incremental') != 'full'
+    future = face_system.gallery_refresher.submit(face_system.refresh_face_encodings, incremental)
+    if request.args.get('wait', 'true').lower() != 'true':
+        return jsonify({
+            'message': 'Face encoding refresh started',
+            'last_refresh': face_system.last_gallery_refresh
+        }), 202
+    
+    report = future.result()
+    if 'error' in report:
+        return jsonify(report), 500
+    return jsonify({'message': 'Face encodings refreshed successfully', **report})
+
+@app.route('/api/face_index')
+def face_index():
+    """API endpoint reporting the face index and its recall against exact search"""
+    index = face_system.gallery.index
+    # Exact search over the sample runs on the request thread, so keep it bounded
+    sample_size = max(1, min(request.args.get('sample', 500, type=int), 2000))
+    return jsonify({
+        'index': index.stats(),
+        'recall': measure_recall(index, sample_size=sample_size)
+    })
+
+@app.route('/api/refresh_schedule')
+def refresh_schedule():
+    """API endpoint to reload detection schedules and the global detection flag"""
+    try:
+        face_system.schedule_cache.reload()
+        return jsonify({'message': 'Detection schedule refreshed successfully'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/refresh_sms_config')
+def refresh_sms_config():
+    """API endpoint to drop the cached SMS configuration"""
+    face_system.sms_dispatcher.invalidate_config()
+    return jsonify({'message': 'SMS configuration refreshed successfully'})
 
 @app.route('/api/refresh_cameras')
 def refresh_cameras():
-    """API endpoint to refresh camera configurations"""
+    """API endpoint to refresh camera configurations, detection zones and gallery partitions"""
     face_system.load_cameras()
     return jsonify({'message': 'Camera configurations refreshed successfully'})
 
 if __name__ == '__main__':
+    # Start attendance writers and SMS workers before cameras start producing events
+    face_system.sms_dispatcher.start()
+    face_system.attendance_writer.start()
+    face_system.encoding_scheduler.start()
+    
     # Start camera processing threads
     camera_threads = face_system.start_all_cameras()
     
+    # Keep the detection schedule cache in sync with admin changes
+    face_system.schedule_cache.start_listener()
+    
     # Start Flask app
     app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
@@ -9,7 +9,7 @@ import threading
 import queue
 from PIL import Image, ImageDraw, ImageFont
 import io
-import base64
+from frame_store import FrameStore
 
 app = Flask(__name__)
 
@@ -29,6 +29,16 @@ class SimpleCameraSystem:
             decode_responses=True
         )
         
+        # Frames are served from memory; set FRAME_STORE_REDIS=true to mirror them to Redis
+        frame_redis_client = None
+        if os.getenv('FRAME_STORE_REDIS', 'false').lower() == 'true':
+            frame_redis_client = redis.Redis(
+                host=os.getenv('REDIS_HOST', 'localhost'),
+                port=int(os.getenv('REDIS_PORT', 6379))
+            )
+        self.frame_store = FrameStore(frame_redis_client)
+        self.placeholders = {}
+        
         self.cameras = []
         self.load_cameras()
         
@@ -49,6 +59,11 @@ class SimpleCameraSystem:
     
     def create_placeholder_image(self, camera_id, location):
         """Create a placeholder image when camera is not available"""
+        # The image only depends on the location, so encode it once
+        cached = self.placeholders.get(location)
+        if cached is not None:
+            return cached
+        
         # Create a simple image with text
         img = Image.new('RGB', (640, 480), color='black')
         draw = ImageDraw.Draw(img)
@@ -80,9 +95,9 @@ class SimpleCameraSystem:
         # Convert to bytes
         img_bytes = io.BytesIO()
         img.save(img_bytes, format='JPEG')
-        img_bytes.seek(0)
         
-        return base64.b64encode(img_bytes.getvalue()).decode()
+        self.placeholders[location] = img_bytes.getvalue()
+        return self.placeholders[location]
     
     def process_camera_stream(self, camera_id, rtsp_url, username, password, location):
         """Process camera stream - simplified version without OpenCV"""
@@ -96,7 +111,7 @@ class SimpleCameraSystem:
                 frame_data = self.create_placeholder_image(camera_id, location)
                 
                 # Store frame for web display
-                self.redis_client.set(f"camera_{camera_id}_frame", frame_data)
+                self.frame_store.put(camera_id, frame_data)
                 
                 # Wait before next frame
                 time.sleep(1)
@@ -118,19 +133,15 @@ def index():
 @app.route('/video_feed/<int:camera_id>')
 def video_feed(camera_id):
     def generate():
+        last_seq = 0
+        # Start with a default placeholder until the camera thread publishes a frame
+        frame_bytes = camera_system.create_placeholder_image(camera_id, f"Camera {camera_id}")
         while True:
-            frame_data = camera_system.redis_client.get(f"camera_{camera_id}_frame")
-            if frame_data:
-                frame_bytes = base64.b64decode(frame_data)
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            else:
-                # Create a default placeholder if no frame data
-                default_img = camera_system.create_placeholder_image(camera_id, f"Camera {camera_id}")
-                frame_bytes = base64.b64decode(default_img)
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            time.sleep(1)
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+            frame = camera_system.frame_store.wait(camera_id, last_seq, timeout=5.0)
+            if frame:
+                last_seq, _, frame_bytes = frame
     
     return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
@@ -0,0 +1,178 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import pymysql
+
+from db_pool import PoolTimeout
+
+AttendanceEvent = namedtuple('AttendanceEvent', [
+    'student_id', 'camera_id', 'attendance_type', 'confidence_score',
+    'image_path', 'student_info', 'queued_at'
+])
+
+
+class AttendanceWriter:
+    """Drains recognition events from a bounded queue and writes them in multi-row batches"""
+
+    def __init__(self, db_pool, event_queue, on_saved, batch_size=50, flush_interval=0.5, workers=1):
+        self.db_pool = db_pool
+        self.queue = event_queue
+        self.on_saved = on_saved
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.workers = workers
+
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.retried = 0
+        self.requeued = 0
+        self.batches = 0
+        self.total_flush = 0.0
+        self.max_latency = 0.0
+        self._connection_failures = 0
+
+    def submit(self, student_id, camera_id, attendance_type, confidence_score, image_path=None, student_info=None):
+        """Queue an attendance event without blocking the camera thread"""
+        event = AttendanceEvent(student_id, camera_id, attendance_type, float(confidence_score),
+                                image_path, student_info, time.time())
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def start(self):
+        """Start the writer worker threads"""
+        threads = []
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._run)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _next_batch(self):
+        """Block for the first event, then collect more until the batch is full or the flush deadline passes"""
+        batch = [self.queue.get()]
+        deadline = time.time() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._write(batch)
+                self._connection_failures = 0
+            except (pymysql.err.IntegrityError, pymysql.err.DataError) as e:
+                # The multi-row INSERT is atomic: find the bad rows instead of losing the whole batch
+                print(f"Error saving attendance batch, retrying row by row: {e}")
+                with self._lock:
+                    self.retried += 1
+                self._write_rows(batch)
+            except (pymysql.err.OperationalError, pymysql.err.InterfaceError, PoolTimeout) as e:
+                self._requeue(batch, e)
+            except Exception as e:
+                print(f"Error saving attendance batch: {e}")
+                with self._lock:
+                    self.failed += len(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _requeue(self, batch, error):
+        """Database unreachable: back off, then put the events back so they are written once it returns"""
+        self._connection_failures += 1
+        delay = min(2 ** (self._connection_failures - 1), 30)
+        print(f"Error saving attendance batch, retrying in {delay}s: {error}")
+        time.sleep(delay)
+
+        lost = 0
+        for event in batch:
+            try:
+                self.queue.put_nowait(event)
+            except queue.Full:
+                lost += 1
+        with self._lock:
+            self.requeued += len(batch) - lost
+            self.failed += lost
+
+    def _write_rows(self, batch):
+        """Write events one at a time, skipping those the database rejects"""
+        for position, event in enumerate(batch):
+            try:
+                self._write([event])
+                self._connection_failures = 0
+            except (pymysql.err.IntegrityError, pymysql.err.DataError) as e:
+                print(f"Error saving attendance for student {event.student_id}: {e}")
+                with self._lock:
+                    self.failed += 1
+            except (pymysql.err.OperationalError, pymysql.err.InterfaceError, PoolTimeout) as e:
+                self._requeue(batch[position:], e)
+                return
+
+    def _write(self, batch):
+        start = time.time()
+        with self.db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                # pymysql turns executemany on INSERT ... VALUES into one multi-row statement, but only
+                # while every value is a bare placeholder, so detected_at is passed as a datetime
+                cursor.executemany("""
+                    INSERT INTO attendance (student_id, camera_id, attendance_type, confidence_score, image_path,
+                                            detected_at)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, [(e.student_id, e.camera_id, e.attendance_type, e.confidence_score, e.image_path,
+                       datetime.fromtimestamp(e.queued_at)) for e in batch])
+                first_id = cursor.lastrowid
+            connection.commit()
+
+        finished = time.time()
+        with self._lock:
+            self.batches += 1
+            self.written += len(batch)
+            self.total_flush += finished - start
+            self.max_latency = max(self.max_latency, finished - batch[0].queued_at)
+
+        # A multi-row INSERT is a "simple insert", so InnoDB assigns it consecutive ids
+        for offset, event in enumerate(batch):
+            try:
+                self.on_saved(first_id + offset, event)
+            except Exception as e:
+                print(f"Error handling saved attendance for student {event.student_id}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self.queue.qsize(),
+                'queue_capacity': self.queue.maxsize,
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'written': self.written,
+                'failed': self.failed,
+                'retried_batches': self.retried,
+                'requeued': self.requeued,
+                'batches': self.batches,
+                'avg_batch_size': round(self.written / self.batches, 2) if self.batches else 0.0,
+                'avg_flush_ms': round(1000 * self.total_flush / self.batches, 3) if self.batches else 0.0,
+                'max_latency_ms': round(1000 * self.max_latency, 3)
+            }
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Face detector benchmark for the face detection service.
+Reports faces/sec, ms per image and recall for each detector backend on a directory of
+sample images with ground truth boxes.
+
+The directory holds the images plus a faces.json mapping each file name to its faces as
+[top, right, bottom, left] boxes in full-image pixels:
+
+    {"gate_0001.jpg": [[120, 410, 260, 300]], "hall_0002.jpg": []}
+
+    python benchmarks/detector_backends.py --images /path/to/samples
+    python benchmarks/detector_backends.py --images /path/to/samples --detectors hog,haar --scale 0.5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from detectors import DETECTORS, detector_spec, get_detector
+
+
+def iou(a, b):
+    """IoU of two (top, right, bottom, left) boxes"""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter) if inter else 0.0
+
+
+def load_samples(directory):
+    with open(os.path.join(directory, 'faces.json')) as f:
+        truth = json.load(f)
+    samples = []
+    for name, boxes in sorted(truth.items()):
+        image = cv2.imread(os.path.join(directory, name))
+        if image is None:
+            print(f"Skipping unreadable image {name}")
+            continue
+        samples.append((name, image, [tuple(box) for box in boxes]))
+    return samples
+
+
+def bench(detector, samples, scale, repeats, iou_threshold):
+    """Time detection on downscaled images and match detections to ground truth greedily"""
+    small_images = [cv2.resize(image, (0, 0), fx=scale, fy=scale) for _, image, _ in samples]
+    detector.detect(small_images[0])  # warm up model loading and allocations
+
+    detected = 0
+    elapsed = 0.0
+    results = []
+    for _ in range(repeats):
+        results = []
+        start = time.perf_counter()
+        for small in small_images:
+            results.append(detector.detect(small))
+        elapsed += time.perf_counter() - start
+        detected += sum(len(locations) for locations in results)
+
+    found = 0
+    expected = 0
+    false_positives = 0
+    for (_, _, truth), locations in zip(samples, results):
+        boxes = [tuple(value / scale for value in location) for location in locations]
+        unmatched = list(boxes)
+        for face in truth:
+            best = max(unmatched, key=lambda box: iou(face, box), default=None)
+            if best is not None and iou(face, best) >= iou_threshold:
+                found += 1
+                unmatched.remove(best)
+        expected += len(truth)
+        false_positives += len(unmatched)
+
+    images = len(samples) * repeats
+    return {
+        'faces_per_sec': detected / elapsed if elapsed else 0.0,
+        'ms_per_image': 1000.0 * elapsed / images,
+        'recall': found / float(expected) if expected else float('nan'),
+        'false_positives': false_positives
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark face detector backends')
+    parser.add_argument('--images', required=True, help='Directory of sample images with a faces.json')
+    parser.add_argument('--detectors', default=','.join(DETECTORS), help='Comma separated backends to compare')
+    parser.add_argument('--scale', type=float, default=0.25, help='Detection scale, as DETECTION_SCALE')
+    parser.add_argument('--repeats', type=int, default=3, help='Passes over the sample set')
+    parser.add_argument('--iou', type=float, default=0.4, help='Minimum IoU for a detection to count as found')
+    args = parser.parse_args()
+
+    samples = load_samples(args.images)
+    if not samples:
+        print("No sample images found")
+        return
+    faces = sum(len(truth) for _, _, truth in samples)
+    print(f"{len(samples)} images, {faces} faces, detection scale {args.scale}\n")
+
+    print(f"{'detector':<10}{'faces/sec':>12}{'ms/image':>12}{'recall':>10}{'false pos':>12}")
+    for name in args.detectors.split(','):
+        name = name.strip()
+        try:
+            detector = get_detector(detector_spec(name))
+        except Exception as e:
+            print(f"{name:<10}unavailable: {e}")
+            continue
+        result = bench(detector, samples, args.scale, args.repeats, args.iou)
+        print(f"{name:<10}{result['faces_per_sec']:>12.1f}{result['ms_per_image']:>12.1f}"
+              f"{result['recall']:>10.3f}{result['false_positives']:>12}")
+
+
+if __name__ == "__main__":
+    main()
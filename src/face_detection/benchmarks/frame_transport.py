@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Frame transport benchmark for the face detection service.
+Compares the old base64-string Redis frames with the binary FrameStore.
+
+    python benchmarks/frame_transport.py --viewers 8 --frame-kb 150
+    python benchmarks/frame_transport.py --redis    # also time real Redis round trips
+"""
+
+import argparse
+import base64
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from frame_store import FrameStore
+
+
+def bench_legacy(frames, viewers, polls_per_frame, redis_client=None):
+    """Producer base64-encodes each frame; every viewer poll decodes and resends it"""
+    sent_bytes = 0
+    start = time.perf_counter()
+    try:
+        for jpeg in frames:
+            encoded = base64.b64encode(jpeg).decode()
+            if redis_client is not None:
+                redis_client.set('bench_camera_frame', encoded)
+            for _ in range(viewers * polls_per_frame):
+                data = redis_client.get('bench_camera_frame') if redis_client is not None else encoded
+                sent_bytes += len(base64.b64decode(data))
+    finally:
+        if redis_client is not None:
+            redis_client.delete('bench_camera_frame')
+    return time.perf_counter() - start, sent_bytes, len(encoded)
+
+
+def bench_binary(frames, viewers, polls_per_frame, redis_client=None):
+    """Producer stores raw bytes once; viewers only receive frames newer than their last one
+
+    With Redis, viewers read through their own store that only holds the client, as a
+    viewer in another process would, so every poll is a real Redis round trip.
+    """
+    store = FrameStore(redis_client)
+    viewer_store = FrameStore(redis_client) if redis_client is not None else store
+    last_seqs = [0] * viewers
+    sent_bytes = 0
+    start = time.perf_counter()
+    try:
+        for jpeg in frames:
+            store.put('bench', jpeg)
+            for _ in range(polls_per_frame):
+                for viewer in range(viewers):
+                    frame = viewer_store.get('bench', last_seqs[viewer])
+                    if frame:
+                        last_seqs[viewer], _, data = frame
+                        sent_bytes += len(data)
+    finally:
+        if redis_client is not None:
+            redis_client.delete(store.redis_key('bench'))
+    return time.perf_counter() - start, sent_bytes, len(frames[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark frame transport between cameras and viewers')
+    parser.add_argument('--frames', type=int, default=200, help='Frames produced per run')
+    parser.add_argument('--frame-kb', type=int, default=150, help='JPEG size in KB')
+    parser.add_argument('--viewers', type=int, default=8, help='Concurrent viewers of one camera')
+    parser.add_argument('--polls-per-frame', type=int, default=2,
+                        help='Viewer polls per produced frame (10 Hz polling of a 5 fps camera = 2)')
+    parser.add_argument('--redis', action='store_true', help='Use a real Redis server from REDIS_HOST/REDIS_PORT')
+    args = parser.parse_args()
+
+    # JPEG payloads are high-entropy, so random bytes are a fair stand-in
+    frames = [os.urandom(args.frame_kb * 1024) for _ in range(args.frames)]
+
+    text_client = binary_client = None
+    if args.redis:
+        import redis
+        host = os.getenv('REDIS_HOST', 'localhost')
+        port = int(os.getenv('REDIS_PORT', 6379))
+        text_client = redis.Redis(host=host, port=port, decode_responses=True)
+        binary_client = redis.Redis(host=host, port=port)
+
+    legacy_time, legacy_sent, legacy_stored = bench_legacy(frames, args.viewers, args.polls_per_frame, text_client)
+    binary_time, binary_sent, binary_stored = bench_binary(frames, args.viewers, args.polls_per_frame, binary_client)
+
+    print(f"{'':<18}{'base64 strings':>16}{'binary store':>16}")
+    print(f"{'stored per frame':<18}{legacy_stored / 1024:>13.1f} KB{binary_stored / 1024:>13.1f} KB")
+    print(f"{'sent to viewers':<18}{legacy_sent / 2**20:>13.1f} MB{binary_sent / 2**20:>13.1f} MB")
+    print(f"{'CPU time':<18}{legacy_time * 1000:>13.1f} ms{binary_time * 1000:>13.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import os
+
+
+def camera_setting(name, camera_id, default, cast=float):
+    """Read NAME_CAMERA_<id> from the environment, falling back to NAME and then the default"""
+    for key in (f"{name}_CAMERA_{camera_id}", name):
+        value = os.getenv(key)
+        if value not in (None, ''):
+            if cast is bool:
+                return value.lower() in ('1', 'true', 'yes', 'on')
+            return cast(value)
+    return default
@@ -0,0 +1,150 @@
+import threading
+import time
+
+import numpy as np
+
+from frame_ring import FrameRing
+
+
+class RateMeter:
+    """Events per second, smoothed with an exponential moving average"""
+
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.count = 0
+        self.rate = 0.0
+        self._last = None
+        self._lock = threading.Lock()
+
+    def tick(self):
+        now = time.time()
+        with self._lock:
+            self.count += 1
+            if self._last is not None and now > self._last:
+                instant = 1.0 / (now - self._last)
+                self.rate += self.smoothing * (instant - self.rate)
+            self._last = now
+
+    def value(self):
+        with self._lock:
+            # Decay towards zero when events stop arriving
+            if self._last is None or time.time() - self._last > 5:
+                return 0.0
+            return self.rate
+
+
+class FrameGrabber:
+    """Drains a cv2.VideoCapture on its own thread into a shared-memory frame ring, latest frame wins"""
+
+    def __init__(self, cap, camera_id, slots=4):
+        self.cap = cap
+        self.camera_id = camera_id
+        self.slots = slots
+        self.running = False
+        self.finished = False
+        self._thread = None
+
+        self.ring = None
+        self._rings = []
+        self._cond = threading.Condition()
+        self._taken_seq = 0
+
+        self.capture_meter = RateMeter()
+        self.frames_dropped = 0
+
+    def start(self):
+        self.running = True
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+        self._thread = thread
+        return thread
+
+    def stop(self, timeout=15.0):
+        """Stop capturing and wait for the thread to leave cap.read(); True once it has exited
+
+        The capture must not be released while the thread may still be reading from it.
+        """
+        self.running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        return True
+
+    def _new_ring(self, frame):
+        # Only happens on the first frame or when the stream changes resolution
+        # Continue the sequence numbers so readers waiting on the old ring see the new frames
+        ring = FrameRing(frame.shape, frame.dtype, self.slots, start_seq=self.ring.seq if self.ring else 0)
+        self._rings.append(ring)
+        return ring
+
+    def _run(self):
+        try:
+            while self.running:
+                ring = self.ring
+                slot = ring.acquire_write_slot() if ring is not None else None
+
+                # Decode straight into the free ring slot when the decoder allows it
+                if slot is not None:
+                    ret, frame = self.cap.read(ring.view(slot))
+                else:
+                    ret, frame = self.cap.read()
+                if not ret:
+                    print(f"Error reading frame from camera {self.camera_id}")
+                    break
+
+                self.capture_meter.tick()
+
+                if ring is None or not ring.fits(frame):
+                    ring = self._new_ring(frame)
+                    slot = ring.acquire_write_slot()
+                if slot is None:
+                    # Every slot is pinned by readers
+                    self.frames_dropped += 1
+                    continue
+                if not np.shares_memory(frame, ring.view(slot)):
+                    ring.view(slot)[...] = frame
+
+                with self._cond:
+                    # The previous frame was never analysed: it is overwritten, not queued
+                    if self.ring is ring and ring.seq > self._taken_seq:
+                        self.frames_dropped += 1
+                    self.ring = ring
+                    ring.publish(slot)
+                    self._cond.notify_all()
+        finally:
+            with self._cond:
+                self.finished = True
+                self._cond.notify_all()
+            for ring in self._rings:
+                ring.close()
+
+    def read(self, last_seq, timeout=10.0):
+        """Wait for a frame newer than last_seq and return it as a pinned FrameLease
+
+        Returns None when the stream ended or no frame arrived within timeout; check
+        finished to tell the two apart.
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while (self.ring is None or self.ring.seq <= last_seq) and not self.finished:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+            if self.finished or self.ring is None:
+                return None
+
+            lease = self.ring.lease_latest(last_seq)
+            if lease is not None:
+                self._taken_seq = lease.seq
+            return lease
+
+    def stats(self):
+        return {
+            'capture_fps': round(self.capture_meter.value(), 2),
+            'frames_captured': self.capture_meter.count,
+            'frames_dropped': self.frames_dropped,
+            'ring_slots': self.slots
+        }
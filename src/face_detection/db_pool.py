@@ -0,0 +1,154 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection became free in time"""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of pymysql connections shared by cameras and Flask handlers"""
+
+    def __init__(self, db_config, max_size=10, timeout=10.0, health_check_interval=30.0):
+        self.db_config = db_config
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._size = 0
+
+        self.created = 0
+        self.closed = 0
+        self.reconnects = 0
+        self.timeouts = 0
+        self.acquisitions = 0
+        self.in_use = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _connect(self):
+        connection = pymysql.connect(**self.db_config)
+        with self._cond:
+            self.created += 1
+        return connection
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self.closed += 1
+            self._cond.notify()
+
+    def acquire(self):
+        """Take a healthy connection from the pool, opening one if below max_size"""
+        start = time.time()
+        deadline = start + self.timeout
+        connection = None
+        last_used = None
+
+        with self._cond:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                self._cond.wait(remaining)
+
+            if self._idle:
+                connection, last_used = self._idle.pop()
+            else:
+                # Reserve the slot before connecting outside the lock
+                self._size += 1
+
+            wait = time.time() - start
+            self.acquisitions += 1
+            self.in_use += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+        try:
+            if connection is None:
+                connection = self._connect()
+            elif time.time() - last_used > self.health_check_interval:
+                # Idle connections may have been dropped by wait_timeout or a MySQL restart
+                server_thread = getattr(connection, 'server_thread_id', None)
+                connection.ping(reconnect=True)
+                if getattr(connection, 'server_thread_id', None) != server_thread:
+                    with self._cond:
+                        self.reconnects += 1
+        except Exception:
+            with self._cond:
+                self.in_use -= 1
+            if connection is not None:
+                self._discard(connection)
+            else:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+            raise
+
+        return connection
+
+    def release(self, connection, broken=False):
+        """Return a connection to the pool, closing it if it is no longer usable"""
+        with self._cond:
+            self.in_use -= 1
+
+        if not broken:
+            try:
+                # End any open transaction so the next user sees fresh data
+                connection.rollback()
+            except Exception:
+                broken = True
+
+        if broken or not connection.open:
+            self._discard(connection)
+            return
+
+        with self._cond:
+            self._idle.append((connection, time.time()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager yielding a pooled connection"""
+        connection = self.acquire()
+        broken = False
+        try:
+            yield connection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(connection, broken)
+
+    def close(self):
+        """Close all idle connections"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self.in_use,
+                'idle': len(self._idle),
+                'created': self.created,
+                'closed': self.closed,
+                'reconnects': self.reconnects,
+                'timeouts': self.timeouts,
+                'acquisitions': self.acquisitions,
+                'avg_wait_ms': round(1000 * self.total_wait / self.acquisitions, 3) if self.acquisitions else 0.0,
+                'max_wait_ms': round(1000 * self.max_wait, 3)
+            }
@@ -0,0 +1,183 @@
+import os
+import threading
+
+import cv2
+import face_recognition
+import numpy as np
+
+from camera_config import camera_setting
+
+FACE_MODELS_DIR = os.getenv('FACE_MODELS_DIR', 'face_models')
+
+
+def _clip(boxes, width, height):
+    """Convert (x, y, w, h) boxes to (top, right, bottom, left) clipped to the image"""
+    locations = []
+    for x, y, w, h in boxes:
+        left, top = max(0, int(x)), max(0, int(y))
+        right, bottom = min(width, int(x + w)), min(height, int(y + h))
+        if right > left and bottom > top:
+            locations.append((top, right, bottom, left))
+    return locations
+
+
+class HogDetector:
+    """dlib HOG (or CNN) detector through face_recognition; the most accurate on small faces"""
+
+    name = 'hog'
+
+    def __init__(self, upsample=1, model='hog'):
+        self.upsample = upsample
+        self.model = model
+
+    def detect(self, image):
+        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return face_recognition.face_locations(rgb_image, number_of_times_to_upsample=self.upsample, model=self.model)
+
+
+class YuNetDetector:
+    """OpenCV's YuNet CNN (cv2.FaceDetectorYN); fast on CPU for near and mid-range faces"""
+
+    name = 'yunet'
+
+    def __init__(self, model_path=None, score_threshold=0.7, nms_threshold=0.3, top_k=50):
+        self.model_path = model_path or os.path.join(FACE_MODELS_DIR, 'face_detection_yunet_2023mar.onnx')
+        self.detector = cv2.FaceDetectorYN.create(self.model_path, '', (320, 320), score_threshold, nms_threshold, top_k)
+        self.input_size = None
+
+    def detect(self, image):
+        height, width = image.shape[:2]
+        if self.input_size != (width, height):
+            self.detector.setInputSize((width, height))
+            self.input_size = (width, height)
+        _, faces = self.detector.detect(image)
+        if faces is None:
+            return []
+        return _clip(faces[:, :4], width, height)
+
+
+class DnnDetector:
+    """OpenCV DNN ResNet-10 SSD face detector (Caffe weights)"""
+
+    name = 'dnn'
+
+    def __init__(self, prototxt=None, weights=None, confidence=0.6, input_size=300):
+        self.prototxt = prototxt or os.path.join(FACE_MODELS_DIR, 'deploy.prototxt')
+        self.weights = weights or os.path.join(FACE_MODELS_DIR, 'res10_300x300_ssd_iter_140000.caffemodel')
+        self.net = cv2.dnn.readNetFromCaffe(self.prototxt, self.weights)
+        self.confidence = confidence
+        self.input_size = input_size
+
+    def detect(self, image):
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(image, 1.0, (self.input_size, self.input_size), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+        detections = detections[detections[:, 2] >= self.confidence]
+        boxes = detections[:, 3:7] * np.array([width, height, width, height])
+        return _clip([(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in boxes], width, height)
+
+
+class HaarDetector:
+    """OpenCV Haar cascade; cheapest option for frontal faces at a controlled entry point"""
+
+    name = 'haar'
+
+    def __init__(self, cascade=None, scale_factor=1.1, min_neighbors=5, min_size=20):
+        self.cascade_path = cascade or os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+        self.cascade = cv2.CascadeClassifier(self.cascade_path)
+        if self.cascade.empty():
+            raise ValueError(f"Could not load Haar cascade {self.cascade_path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, image):
+        gray = cv2.equalizeHist(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+        boxes = self.cascade.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=(self.min_size, self.min_size)
+        )
+        return _clip(boxes, image.shape[1], image.shape[0])
+
+
+DETECTORS = {
+    'hog': HogDetector,
+    'yunet': YuNetDetector,
+    'dnn': DnnDetector,
+    'haar': HaarDetector
+}
+
+# Speed/accuracy knobs per backend: option name -> (setting name, default, type)
+DETECTOR_OPTIONS = {
+    'hog': {
+        'upsample': ('DETECTOR_HOG_UPSAMPLE', 1, int),
+        'model': ('DETECTOR_HOG_MODEL', 'hog', str)
+    },
+    'yunet': {
+        'model_path': ('DETECTOR_YUNET_MODEL', None, str),
+        'score_threshold': ('DETECTOR_YUNET_SCORE', 0.7, float),
+        'nms_threshold': ('DETECTOR_YUNET_NMS', 0.3, float)
+    },
+    'dnn': {
+        'confidence': ('DETECTOR_DNN_CONFIDENCE', 0.6, float),
+        'input_size': ('DETECTOR_DNN_INPUT_SIZE', 300, int)
+    },
+    'haar': {
+        'scale_factor': ('DETECTOR_HAAR_SCALE_FACTOR', 1.1, float),
+        'min_neighbors': ('DETECTOR_HAAR_MIN_NEIGHBORS', 5, int),
+        'min_size': ('DETECTOR_HAAR_MIN_SIZE', 20, int)
+    }
+}
+
+# Detectors built by this thread, keyed by spec; OpenCV detectors keep per-call state
+_local = threading.local()
+
+
+def detector_spec(name, **options):
+    """Hashable, picklable description of a detector that worker processes can rebuild"""
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown face detector: {name}")
+    return name, tuple(sorted((key, value) for key, value in options.items() if value is not None))
+
+
+def _camera_options(name, camera_id):
+    return {
+        option: camera_setting(setting, camera_id, default, cast)
+        for option, (setting, default, cast) in DETECTOR_OPTIONS.get(name, {}).items()
+    }
+
+
+def detector_spec_for_camera(camera_id):
+    """Read FACE_DETECTOR and the backend's DETECTOR_* knobs, each overridable per camera
+
+    The detector is built once here, at camera start, so a missing model file falls back
+    to HOG instead of failing inside the recognition workers.
+    """
+    name = camera_setting('FACE_DETECTOR', camera_id, 'hog', str).lower()
+    if name not in DETECTORS:
+        print(f"Unknown face detector {name} for camera {camera_id}, using hog")
+        name = 'hog'
+    spec = detector_spec(name, **_camera_options(name, camera_id))
+    if name == 'hog':
+        return spec
+
+    try:
+        get_detector(spec)
+    except Exception as e:
+        print(f"Error loading face detector {name} for camera {camera_id}, using hog: {e}")
+        spec = detector_spec('hog', **_camera_options('hog', camera_id))
+    return spec
+
+
+def get_detector(spec=None):
+    """Return the detector for a spec, building it on first use; HOG when spec is None"""
+    spec = spec or ('hog', ())
+    instances = getattr(_local, 'instances', None)
+    if instances is None:
+        instances = _local.instances = {}
+    detector = instances.get(spec)
+    if detector is None:
+        name, options = spec
+        detector = instances[spec] = DETECTORS[name](**dict(options))
+    return detector
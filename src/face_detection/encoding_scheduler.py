@@ -0,0 +1,157 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from inference import face_chip
+
+
+class EncodingRequest:
+    """Face chips from one camera frame waiting for encoding and recognition"""
+
+    def __init__(self, camera_id, chips, face_locations):
+        self.camera_id = camera_id
+        self.chips = chips
+        self.face_locations = face_locations
+        self.future = Future()
+        self.submitted_at = time.time()
+
+
+class EncodingScheduler:
+    """Collects face chips from all cameras into micro-batches for encoding and recognition
+
+    Each batch is encoded in one inference call and matched against the gallery with one
+    vectorised lookup. A batch closes when it holds max_batch faces or its first request has
+    waited max_latency seconds. One dispatcher runs per inference worker, so while every
+    worker is busy requests keep accumulating and batches grow with the load.
+    """
+
+    def __init__(self, inference, recognize, max_batch=16, max_latency=0.02, dispatchers=None):
+        self.inference = inference
+        self.recognize = recognize
+        self.max_batch = max(1, max_batch)
+        self.max_latency = max_latency
+        self.dispatchers = dispatchers or max(1, inference.workers)
+
+        self.requests = queue.Queue()
+        self._carry = None
+        self._collect_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._threads = []
+
+        self.batches = 0
+        self.requests_done = 0
+        self.faces = 0
+        self.largest_batch = 0
+        self.cameras_per_batch = 0
+        self.wait_seconds = 0.0
+        self.errors = 0
+
+    def start(self):
+        for _ in range(self.dispatchers):
+            thread = threading.Thread(target=self._run)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        return self._threads
+
+    def submit(self, camera_id, frame, face_locations, scale):
+        """Queue the faces at face_locations (detection-scale boxes) of a frame; returns a Future
+
+        The chips are cut immediately, so the frame may be released once this returns.
+        """
+        chips, chip_locations = [], []
+        for location in face_locations:
+            chip, chip_location = face_chip(frame, location, scale)
+            chips.append(chip)
+            chip_locations.append(chip_location)
+
+        request = EncodingRequest(camera_id, chips, chip_locations)
+        if not chips:
+            request.future.set_result(([], [], []))
+        elif not self._threads:
+            # Not started (e.g. a one-off script): encode inline
+            self._process([request])
+        else:
+            self.requests.put(request)
+        return request.future
+
+    def encode_and_match(self, camera_id, frame, face_locations, scale):
+        """Blocking form of submit(); returns (names, confidences, matches) in face order"""
+        return self.submit(camera_id, frame, face_locations, scale).result()
+
+    def _collect(self):
+        """Wait for a request, then gather more until the batch is full or the first one is due"""
+        with self._collect_lock:
+            first = self._carry or self.requests.get()
+            self._carry = None
+            batch = [first]
+            faces = len(first.chips)
+            deadline = first.submitted_at + self.max_latency
+
+            while faces < self.max_batch:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if faces + len(request.chips) > self.max_batch:
+                    # Never split a frame's faces; it opens the next batch
+                    self._carry = request
+                    break
+                batch.append(request)
+                faces += len(request.chips)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self._process(batch)
+
+    def _process(self, batch):
+        chips = [chip for request in batch for chip in request.chips]
+        face_locations = [location for request in batch for location in request.face_locations]
+        camera_ids = [request.camera_id for request in batch for _ in request.chips]
+        started = time.time()
+        try:
+            face_encodings = self.inference.encode_chips(chips, face_locations)
+            names, confidences, matches = self.recognize(face_encodings, camera_ids)
+        except Exception as e:
+            print(f"Error encoding face batch: {e}")
+            with self._lock:
+                self.errors += 1
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.requests_done += len(batch)
+            self.faces += len(chips)
+            self.largest_batch = max(self.largest_batch, len(chips))
+            self.cameras_per_batch += len(set(request.camera_id for request in batch))
+            self.wait_seconds += sum(started - request.submitted_at for request in batch)
+
+        start = 0
+        for request in batch:
+            end = start + len(request.chips)
+            request.future.set_result((names[start:end], confidences[start:end], matches[start:end]))
+            start = end
+
+    def stats(self):
+        with self._lock:
+            batches = self.batches or 1
+            return {
+                'max_batch': self.max_batch,
+                'max_latency_ms': self.max_latency * 1000.0,
+                'batches': self.batches,
+                'faces': self.faces,
+                'mean_batch_size': round(self.faces / batches, 2),
+                'largest_batch': self.largest_batch,
+                'mean_cameras_per_batch': round(self.cameras_per_batch / batches, 2),
+                'mean_wait_ms': round(1000.0 * self.wait_seconds / max(1, self.requests_done), 2),
+                'queued': self.requests.qsize(),
+                'errors': self.errors
+            }
@@ -0,0 +1,164 @@
+import os
+import time
+import numpy as np
+
+
+class ExactIndex:
+    """Brute force search over the whole gallery"""
+
+    kind = 'exact'
+
+    def __init__(self, gallery):
+        self.gallery = gallery
+
+    def search(self, queries):
+        """Return the nearest gallery index and distance for every query"""
+        dists = self.gallery.distances(queries)
+        best = np.argmin(dists, axis=1)
+        return best, dists[np.arange(len(best)), best]
+
+    def stats(self):
+        return {'kind': self.kind, 'size': len(self.gallery)}
+
+
+class IVFIndex:
+    """Inverted file index: k-means coarse quantizer plus exact re-ranking of probed lists"""
+
+    kind = 'ivf'
+
+    def __init__(self, gallery, nlist, nprobe, centroids=None, train_iterations=10, seed=0):
+        self.gallery = gallery
+        self.nprobe = nprobe
+        self.build_seconds = 0.0
+        self.retrained = centroids is None
+
+        start = time.time()
+        if centroids is None:
+            centroids = self._train(gallery.encodings, nlist, train_iterations, seed)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.centroid_sq_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+        assignments = self._assign(gallery.encodings)
+        order = np.argsort(assignments, kind='stable')
+        bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        self.build_seconds = time.time() - start
+
+    def _centroid_sq_dists(self, vectors, centroids, centroid_sq_norms):
+        vector_sq_norms = np.einsum('ij,ij->i', vectors, vectors)
+        return vector_sq_norms[:, None] + centroid_sq_norms[None, :] - 2.0 * (vectors @ centroids.T)
+
+    def _train(self, encodings, nlist, iterations, seed):
+        """Plain Lloyd's k-means on (a sample of) the gallery"""
+        rng = np.random.default_rng(seed)
+        nlist = max(1, min(nlist, len(encodings)))
+
+        # 64 points per list is plenty to place the centroids
+        sample_size = min(len(encodings), nlist * 64)
+        sample = encodings[rng.choice(len(encodings), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            sq_norms = np.einsum('ij,ij->i', centroids, centroids)
+            labels = np.argmin(self._centroid_sq_dists(sample, centroids, sq_norms), axis=1)
+            counts = np.bincount(labels, minlength=nlist)
+            order = np.argsort(labels, kind='stable')
+
+            # Keep the old position for lists that ran empty
+            filled = counts > 0
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+            sums = np.add.reduceat(sample[order], starts, axis=0)
+            centroids[filled] = sums / counts[filled, None]
+
+        return centroids
+
+    def _assign(self, vectors):
+        if len(vectors) == 0:
+            return np.empty(0, dtype=np.intp)
+        dists = self._centroid_sq_dists(vectors, self.centroids, self.centroid_sq_norms)
+        return np.argmin(dists, axis=1)
+
+    def search(self, queries):
+        """Return the approximate nearest gallery index and distance for every query"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+        nprobe = min(self.nprobe, len(self.centroids))
+        coarse = self._centroid_sq_dists(queries, self.centroids, self.centroid_sq_norms)
+        probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+        best = np.full(len(queries), -1, dtype=np.intp)
+        best_dists = np.full(len(queries), np.inf, dtype=np.float32)
+        encodings = self.gallery.encodings
+        sq_norms = self.gallery.sq_norms
+
+        for i, query in enumerate(queries):
+            candidates = np.concatenate([self.lists[p] for p in probes[i]])
+            if len(candidates) == 0:
+                continue
+            sq_dists = sq_norms[candidates] + query @ query - 2.0 * (encodings[candidates] @ query)
+            j = np.argmin(sq_dists)
+            best[i] = candidates[j]
+            best_dists[i] = np.sqrt(max(sq_dists[j], 0.0))
+
+        return best, best_dists
+
+    def stats(self):
+        sizes = [len(l) for l in self.lists]
+        return {
+            'kind': self.kind,
+            'size': len(self.gallery),
+            'nlist': len(self.centroids),
+            'nprobe': self.nprobe,
+            'largest_list': max(sizes) if sizes else 0,
+            'retrained': self.retrained,
+            'build_seconds': round(self.build_seconds, 4)
+        }
+
+
+def build_index(gallery, previous=None):
+    """Build the search index selected by FACE_INDEX (auto, exact or ivf)"""
+    kind = os.getenv('FACE_INDEX', 'auto').lower()
+    auto_min = int(os.getenv('FACE_INDEX_AUTO_MIN', 20000))
+
+    if kind == 'exact' or (kind == 'auto' and len(gallery) < auto_min) or len(gallery) == 0:
+        return ExactIndex(gallery)
+
+    nlist = int(os.getenv('FACE_INDEX_NLIST', 0)) or int(4 * np.sqrt(len(gallery)))
+    nprobe = int(os.getenv('FACE_INDEX_NPROBE', 8))
+
+    # Reuse trained centroids on refresh unless the gallery changed size a lot,
+    # so a refresh only re-assigns rows to lists instead of re-running k-means
+    centroids = None
+    if isinstance(previous, IVFIndex) and len(previous.centroids) <= len(gallery):
+        growth = len(gallery) / max(len(previous.gallery), 1)
+        if 0.5 <= growth <= 2.0:
+            centroids = previous.centroids
+
+    return IVFIndex(gallery, nlist, nprobe, centroids=centroids)
+
+
+def measure_recall(index, sample_size=500, noise=0.02, seed=0):
+    """Top-1 recall of an index against exact search on perturbed gallery samples"""
+    gallery = index.gallery
+    if len(gallery) == 0:
+        return {'recall': None, 'queries': 0}
+
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(gallery), min(sample_size, len(gallery)), replace=False)
+
+    # Perturb the enrolled encodings to look like fresh captures of the same people
+    queries = gallery.encodings[rows] + rng.normal(0.0, noise, (len(rows), gallery.encodings.shape[1])).astype(np.float32)
+
+    start = time.time()
+    approx, _ = index.search(queries)
+    approx_seconds = time.time() - start
+
+    start = time.time()
+    exact, _ = ExactIndex(gallery).search(queries)
+    exact_seconds = time.time() - start
+
+    return {
+        'recall': float(np.mean(approx == exact)),
+        'queries': len(rows),
+        'index_ms_per_query': round(1000 * approx_seconds / len(rows), 4),
+        'exact_ms_per_query': round(1000 * exact_seconds / len(rows), 4)
+    }
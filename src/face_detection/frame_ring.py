@@ -0,0 +1,106 @@
+import threading
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Everything a worker process needs to map one slot of a ring
+FrameRef = namedtuple('FrameRef', ['segment_name', 'offset', 'shape', 'dtype'])
+
+HEADER_ALIGN = 64
+
+
+class FrameLease:
+    """A pinned ring slot; the writer will not reuse it until released"""
+
+    def __init__(self, ring, slot, seq):
+        self.ring = ring
+        self.slot = slot
+        self.seq = seq
+        self.frame = ring.view(slot)
+        self.ref = ring.ref(slot)
+
+    def release(self):
+        if self.ring is not None:
+            self.ring.unpin(self.slot)
+            self.ring = None
+
+
+class FrameRing:
+    """Fixed-size frame slots with sequence numbers in one shared memory segment"""
+
+    def __init__(self, shape, dtype=np.uint8, slots=4, start_seq=0):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+
+        # Header: one int64 sequence number per slot (0 = empty or being written)
+        self.header_bytes = -(-8 * slots // HEADER_ALIGN) * HEADER_ALIGN
+        self.segment = shared_memory.SharedMemory(create=True, size=self.header_bytes + slots * self.frame_bytes)
+        self.slot_seqs = np.ndarray((slots,), dtype=np.int64, buffer=self.segment.buf)
+        self.slot_seqs[:] = 0
+
+        self._views = [
+            np.ndarray(self.shape, dtype=self.dtype, buffer=self.segment.buf, offset=self.offset(slot))
+            for slot in range(slots)
+        ]
+        self._lock = threading.Lock()
+        self._pins = [0] * slots
+        self._next = 0
+        self.seq = start_seq
+        self.latest_slot = -1
+
+    def offset(self, slot):
+        return self.header_bytes + slot * self.frame_bytes
+
+    def view(self, slot):
+        """Zero-copy ndarray over a slot"""
+        return self._views[slot]
+
+    def ref(self, slot):
+        return FrameRef(self.segment.name, self.offset(slot), self.shape, self.dtype.str)
+
+    def fits(self, frame):
+        return frame.shape == self.shape and frame.dtype == self.dtype
+
+    def acquire_write_slot(self):
+        """Pick the next slot that is neither pinned nor the latest frame; None if all are busy"""
+        with self._lock:
+            for _ in range(self.slots):
+                slot = self._next
+                self._next = (self._next + 1) % self.slots
+                if self._pins[slot] == 0 and slot != self.latest_slot:
+                    self.slot_seqs[slot] = 0
+                    return slot
+            return None
+
+    def publish(self, slot):
+        """Make a fully written slot the latest frame"""
+        with self._lock:
+            self.seq += 1
+            self.slot_seqs[slot] = self.seq
+            self.latest_slot = slot
+            return self.seq
+
+    def lease_latest(self, after_seq=0):
+        """Pin and return the latest frame if it is newer than after_seq"""
+        with self._lock:
+            if self.latest_slot < 0 or self.seq <= after_seq:
+                return None
+            self._pins[self.latest_slot] += 1
+            return FrameLease(self, self.latest_slot, self.seq)
+
+    def unpin(self, slot):
+        with self._lock:
+            self._pins[slot] -= 1
+
+    def close(self):
+        self._views = []
+        self.slot_seqs = None
+        try:
+            self.segment.close()
+        except BufferError:
+            # A caller still holds a view; the mapping goes away with it
+            pass
+        self.segment.unlink()
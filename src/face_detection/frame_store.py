@@ -0,0 +1,120 @@
+import threading
+import time
+
+
+class FrameStore:
+    """Latest JPEG per camera with a sequence number and timestamp
+
+    Frames are kept in process for the local /video_feed handlers and can also be
+    mirrored to Redis as raw bytes (through a decode_responses=False client) for
+    viewers running in other processes. Local viewers block in wait() on a
+    per-camera condition and are woken once per new frame instead of polling.
+    """
+
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client
+        self._lock = threading.Lock()
+        self._frames = {}
+        self._conditions = {}
+
+        self.frames_put = 0
+        self.bytes_put = 0
+        self.frames_served = 0
+        self.not_modified = 0
+        self.waiting_viewers = 0
+
+    def _condition(self, camera_id):
+        # Called with self._lock held; all cameras share the lock, each has its own waiters
+        condition = self._conditions.get(camera_id)
+        if condition is None:
+            condition = self._conditions[camera_id] = threading.Condition(self._lock)
+        return condition
+
+    def redis_key(self, camera_id):
+        return f"camera_{camera_id}_frame_bin"
+
+    def put(self, camera_id, jpeg_bytes):
+        """Store a new frame and return its sequence number"""
+        timestamp = time.time()
+        with self._lock:
+            previous = self._frames.get(camera_id)
+            seq = previous[0] + 1 if previous else 1
+            self._frames[camera_id] = (seq, timestamp, jpeg_bytes)
+            self.frames_put += 1
+            self.bytes_put += len(jpeg_bytes)
+            self._condition(camera_id).notify_all()
+
+        if self.redis_client is not None:
+            try:
+                self.redis_client.hset(self.redis_key(camera_id), mapping={
+                    'seq': seq, 'ts': timestamp, 'jpeg': jpeg_bytes
+                })
+            except Exception as e:
+                print(f"Error storing frame for camera {camera_id}: {e}")
+
+        return seq
+
+    def get(self, camera_id, after_seq=0):
+        """Return (seq, timestamp, jpeg_bytes) if a frame newer than after_seq exists, else None"""
+        with self._lock:
+            frame = self._frames.get(camera_id)
+
+        if frame is None and self.redis_client is not None:
+            frame = self._get_from_redis(camera_id, after_seq)
+
+        with self._lock:
+            if frame is None or frame[0] <= after_seq:
+                self.not_modified += 1
+                return None
+            self.frames_served += 1
+        return frame
+
+    def wait(self, camera_id, after_seq=0, timeout=5.0):
+        """Block until a frame newer than after_seq is stored; returns it, or None on timeout"""
+        deadline = time.time() + timeout
+        with self._lock:
+            frame = self._frames.get(camera_id)
+            if frame is not None or self.redis_client is None:
+                condition = self._condition(camera_id)
+                self.waiting_viewers += 1
+                try:
+                    while frame is None or frame[0] <= after_seq:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            return None
+                        condition.wait(remaining)
+                        frame = self._frames.get(camera_id)
+                finally:
+                    self.waiting_viewers -= 1
+                self.frames_served += 1
+                return frame
+
+        # Frames produced by another process: poll the Redis mirror until the deadline
+        while True:
+            frame = self.get(camera_id, after_seq)
+            if frame is not None or time.time() >= deadline:
+                return frame
+            time.sleep(0.1)
+
+    def _get_from_redis(self, camera_id, after_seq):
+        key = self.redis_key(camera_id)
+        seq = self.redis_client.hget(key, 'seq')
+        if seq is None or int(seq) <= after_seq:
+            return None
+
+        # Only transfer the JPEG once the cheap sequence check says it is new
+        seq, timestamp, jpeg_bytes = self.redis_client.hmget(key, 'seq', 'ts', 'jpeg')
+        if jpeg_bytes is None:
+            return None
+        return int(seq), float(timestamp), jpeg_bytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                'frames_put': self.frames_put,
+                'bytes_put': self.bytes_put,
+                'frames_served': self.frames_served,
+                'not_modified': self.not_modified,
+                'waiting_viewers': self.waiting_viewers,
+                'redis_mirror': self.redis_client is not None
+            }
@@ -0,0 +1,290 @@
+import numpy as np
+from face_index import ExactIndex, build_index
+
+ENCODING_DIM = 128
+
+# Stored encodings are little-endian float32 BLOBs (students.face_embedding), tagged in
+# students.face_model with the model that produced them so vectors of different models never mix
+FACE_MODEL = 'dlib_resnet_v1'
+ENCODING_DTYPE = np.dtype('<f4')
+ENCODING_BYTES = ENCODING_DIM * ENCODING_DTYPE.itemsize
+
+
+def encoding_to_blob(encoding):
+    """Pack one encoding for the face_embedding column"""
+    return np.asarray(encoding, dtype=ENCODING_DTYPE).reshape(ENCODING_DIM).tobytes()
+
+
+def blob_to_encoding(blob):
+    """Zero-copy float32 view of a face_embedding value"""
+    if blob is None or len(blob) != ENCODING_BYTES:
+        raise ValueError(f"expected {ENCODING_BYTES} bytes, got {None if blob is None else len(blob)}")
+    return np.frombuffer(blob, dtype=ENCODING_DTYPE)
+
+
+def select_prototypes(encodings, k, iterations=20):
+    """Indexes of up to k medoids of a student's samples, largest cluster first
+
+    Medoids are real samples, so prototypes never drift into a face nobody has. Starts from
+    the overall medoid plus farthest points and alternates assignment and medoid update.
+    """
+    samples = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+    if not len(samples):
+        return []
+
+    # Identical photos (e.g. the upload also copied into the samples folder) count once, with weight
+    _, distinct, weights = np.unique(samples, axis=0, return_index=True, return_counts=True)
+    if len(distinct) <= k:
+        return [int(distinct[i]) for i in np.argsort(-weights, kind='stable')]
+
+    points = samples[distinct]
+    diff = points[:, None, :] - points[None, :, :]
+    pairwise = np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+    medoids = [int(np.argmin(pairwise @ weights))]
+    while len(medoids) < k:
+        medoids.append(int(np.argmax(pairwise[:, medoids].min(axis=1))))
+
+    for _ in range(iterations):
+        assignment = np.argmin(pairwise[:, medoids], axis=1)
+        updated = []
+        for cluster in range(k):
+            members = np.flatnonzero(assignment == cluster)
+            if not members.size:
+                # Keep the old medoid rather than leave the cluster without one
+                updated.append(medoids[cluster])
+                continue
+            costs = pairwise[np.ix_(members, members)] @ weights[members]
+            updated.append(int(members[np.argmin(costs)]))
+        if updated == medoids:
+            break
+        medoids = updated
+
+    sizes = np.bincount(np.argmin(pairwise[:, medoids], axis=1), weights=weights, minlength=k)
+    return [int(distinct[medoids[cluster]]) for cluster in np.argsort(-sizes, kind='stable')]
+
+
+class SampleBank:
+    """Every enrollment sample grouped by student, used to settle close calls between prototypes"""
+
+    def __init__(self, encodings, student_ids):
+        student_ids = np.asarray(student_ids, dtype=np.int64)
+        if len(student_ids):
+            self.encodings = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        else:
+            self.encodings = np.empty((0, ENCODING_DIM), dtype=np.float32)
+        # Already-sorted banks (snapshots) stay as they are, so a memory-mapped matrix is not copied
+        if np.any(student_ids[1:] < student_ids[:-1]):
+            order = np.argsort(student_ids, kind='stable')
+            self.encodings = self.encodings[order]
+            student_ids = student_ids[order]
+        self.student_ids = student_ids
+        unique_ids, starts, counts = np.unique(self.student_ids, return_index=True, return_counts=True)
+        self._ranges = {int(student_id): (start, start + count)
+                        for student_id, start, count in zip(unique_ids, starts, counts)}
+
+    def __len__(self):
+        return self.encodings.shape[0]
+
+    def for_student(self, student_id):
+        """(n x 128) samples of one student; empty when none were stored"""
+        start, end = self._ranges.get(int(student_id), (0, 0))
+        return self.encodings[start:end]
+
+    def with_changes(self, removed_ids, changes):
+        """New bank without the samples of removed_ids, with the samples of changes appended"""
+        keep = ~np.isin(self.student_ids, np.asarray(removed_ids, dtype=np.int64))
+        if changes is None:
+            return SampleBank(self.encodings[keep], self.student_ids[keep])
+        return SampleBank(np.concatenate([self.encodings[keep], changes.encodings]),
+                          np.concatenate([self.student_ids[keep], changes.student_ids]))
+
+
+class FaceGallery:
+    """Known face encodings stored as one contiguous float32 matrix
+
+    A student may own several rows, one per prototype encoding.
+    """
+
+    @classmethod
+    def from_students(cls, encodings, student_ids, names, roll_numbers, parent_names, parent_phones, grades,
+                      samples=None, version=None):
+        """Gallery with one row per student prototype; samples is a list of (student_id, encoding, is_prototype)
+
+        Students without stored samples keep their single encoding.
+        """
+        prototypes = {}
+        for student_id, encoding, is_prototype in samples or []:
+            if is_prototype:
+                prototypes.setdefault(student_id, []).append(encoding)
+
+        rows = []
+        row_encodings = []
+        for i, student_id in enumerate(student_ids):
+            student_encodings = prototypes.get(student_id) or [encodings[i]]
+            rows.extend([i] * len(student_encodings))
+            row_encodings.extend(student_encodings)
+
+        bank = None
+        if samples:
+            bank = SampleBank([encoding for _, encoding, _ in samples], [student_id for student_id, _, _ in samples])
+        return cls(
+            np.asarray(row_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM),
+            [student_ids[i] for i in rows], [names[i] for i in rows], [roll_numbers[i] for i in rows],
+            [parent_names[i] for i in rows], [parent_phones[i] for i in rows], [grades[i] for i in rows],
+            samples=bank, version=version
+        )
+
+    def __init__(self, encodings, student_ids, names, roll_numbers, parent_names=None, parent_phones=None,
+                 grades=None, samples=None, version=None):
+        if len(encodings):
+            self.encodings = np.ascontiguousarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        else:
+            self.encodings = np.empty((0, ENCODING_DIM), dtype=np.float32)
+
+        # Squared norms are reused by every distance computation
+        self.sq_norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+        # Student details parallel to the matrix rows, so a match resolves without SQL
+        self.student_ids = np.asarray(student_ids, dtype=np.int64)
+        self.names = list(names)
+        self.roll_numbers = list(roll_numbers)
+        self.parent_names = list(parent_names) if parent_names is not None else [None] * len(self.names)
+        self.parent_phones = list(parent_phones) if parent_phones is not None else [None] * len(self.names)
+        # Snapshots leave parent contacts out; until they are filled in, student_info defers to the database
+        self.has_contacts = parent_phones is not None
+        self.grades = list(grades) if grades is not None else [None] * len(self.names)
+        # Full enrollment samples behind the prototypes, or None when only prototypes are known
+        self.samples = samples
+        self.index = ExactIndex(self)
+        # Newest students.updated_at (UNIX time) reflected here; incremental refreshes fetch from it
+        self.version = version
+        # Row digest per student already reflected at exactly version; a refresh skips those rows
+        # only while their digest is unchanged, since a same-second edit keeps the same updated_at
+        self.version_rows = {}
+        # Students whose stored encoding could not be decoded; counted when checking for deletes
+        self.rejected_ids = frozenset()
+        # Sub-galleries per grade set, built with the gallery and swapped in along with it
+        self._partitions = {}
+
+    def attach_index(self, previous=None):
+        """Build the configured search index, reusing training from the previous one"""
+        self.index = build_index(self, previous)
+        return self.index
+
+    def with_changes(self, removed_ids, changes, version=None):
+        """New gallery without the students in removed_ids or changes, with the rows of changes appended
+
+        The gallery itself is never modified, so threads holding it keep a consistent view.
+        """
+        replaced = np.concatenate([np.asarray(removed_ids, dtype=np.int64), changes.student_ids])
+        keep = np.flatnonzero(~np.isin(self.student_ids, replaced))
+        samples = self.samples
+        if samples is not None or changes.samples is not None:
+            samples = (samples or SampleBank([], [])).with_changes(replaced, changes.samples)
+        gallery = FaceGallery(
+            np.concatenate([self.encodings[keep], changes.encodings]),
+            np.concatenate([self.student_ids[keep], changes.student_ids]),
+            [self.names[i] for i in keep] + changes.names,
+            [self.roll_numbers[i] for i in keep] + changes.roll_numbers,
+            [self.parent_names[i] for i in keep] + changes.parent_names,
+            [self.parent_phones[i] for i in keep] + changes.parent_phones,
+            [self.grades[i] for i in keep] + changes.grades,
+            samples=samples,
+            version=version if version is not None else self.version
+        )
+        gallery.has_contacts = self.has_contacts and changes.has_contacts
+        return gallery
+
+    def fill_contacts(self, contacts):
+        """Set parent (name, phone) per row from a student_id -> (parent_name, parent_phone) dict
+
+        Only for a gallery that has not been published yet.
+        """
+        rows = [contacts.get(int(student_id), (None, None)) for student_id in self.student_ids]
+        self.parent_names = [parent_name for parent_name, _ in rows]
+        self.parent_phones = [parent_phone for _, parent_phone in rows]
+        self.has_contacts = True
+
+    def partition(self, grades):
+        """Sub-gallery of the students in grades, e.g. the classes a camera can see
+
+        Built on first use and cached; partitions are small, so they keep the exact index.
+        """
+        key = frozenset(grades)
+        partition = self._partitions.get(key)
+        if partition is None:
+            rows = [i for i, grade in enumerate(self.grades) if grade in key]
+            partition = FaceGallery(
+                self.encodings[rows], self.student_ids[rows],
+                [self.names[i] for i in rows], [self.roll_numbers[i] for i in rows],
+                [self.parent_names[i] for i in rows], [self.parent_phones[i] for i in rows],
+                [self.grades[i] for i in rows], samples=self.samples, version=self.version
+            )
+            partition.has_contacts = self.has_contacts
+            self._partitions[key] = partition
+        return partition
+
+    def student_count(self):
+        return int(np.unique(self.student_ids).size)
+
+    def refine(self, face_encodings, indexes, distances, threshold, margin, max_candidates=5):
+        """Settle close calls against every enrollment sample of the nearest students
+
+        Faces whose prototype distance lies within margin of threshold are compared with all
+        samples of up to max_candidates students whose prototypes are within margin of the best.
+        Returns new (indexes, distances) and the number of faces re-ranked.
+        """
+        close = np.flatnonzero((indexes >= 0) & (np.abs(distances - threshold) <= margin))
+        if self.samples is None or not len(self.samples) or not close.size:
+            return indexes, distances, 0
+
+        indexes = np.array(indexes, copy=True)
+        distances = np.array(distances, copy=True)
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)[close]
+        for row, query, row_distances in zip(close, queries, self.distances(queries)):
+            candidates = np.flatnonzero(row_distances <= distances[row] + margin)
+            candidates = candidates[np.argsort(row_distances[candidates], kind='stable')]
+            seen = set()
+            for candidate in candidates:
+                student_id = int(self.student_ids[candidate])
+                if student_id in seen:
+                    continue
+                seen.add(student_id)
+                samples = self.samples.for_student(student_id)
+                if len(samples):
+                    diff = samples - query
+                    distance = float(np.sqrt(np.einsum('ij,ij->i', diff, diff).min()))
+                    # The candidate is the student's nearest prototype row, so the match still resolves
+                    if distance < distances[row]:
+                        indexes[row] = candidate
+                        distances[row] = distance
+                if len(seen) >= max_candidates:
+                    break
+        return indexes, distances, int(close.size)
+
+    def student_info(self, index):
+        """Return (name, roll_number, parent_phone, parent_name) for a gallery row, None without contacts"""
+        if not self.has_contacts:
+            return None
+        return (self.names[index], self.roll_numbers[index],
+                self.parent_phones[index], self.parent_names[index])
+
+    def __len__(self):
+        return self.encodings.shape[0]
+
+    def distances(self, face_encodings):
+        """Return the (M x N) euclidean distance matrix between faces and the gallery"""
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+
+        # |q - g|^2 = |q|^2 + |g|^2 - 2 q.g, computed for all pairs in one matmul
+        query_sq_norms = np.einsum('ij,ij->i', queries, queries)
+        sq_dists = query_sq_norms[:, None] + self.sq_norms[None, :] - 2.0 * (queries @ self.encodings.T)
+        np.maximum(sq_dists, 0.0, out=sq_dists)
+        return np.sqrt(sq_dists)
+
+    def match(self, face_encodings):
+        """Return the best gallery index and its distance for every face"""
+        if len(face_encodings) == 0 or len(self) == 0:
+            count = len(face_encodings)
+            return np.full(count, -1, dtype=np.intp), np.full(count, np.inf, dtype=np.float32)
+
+        return self.index.search(face_encodings)
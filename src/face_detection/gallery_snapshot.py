@@ -0,0 +1,176 @@
+import glob
+import hashlib
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+
+from gallery import FaceGallery, SampleBank, FACE_MODEL
+
+# Bump when the snapshot layout changes so old files are never read
+SNAPSHOT_FORMAT = 6
+
+
+def gallery_db_state(connection):
+    """Cheap fingerprint of the gallery rows: count, newest update and a checksum of (id, updated_at)
+
+    Any insert, update, deactivation or delete of an enrolled student changes it.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT COUNT(*), UNIX_TIMESTAMP(MAX(updated_at)),
+                   BIT_XOR(CRC32(CONCAT(id, ':', UNIX_TIMESTAMP(updated_at))))
+            FROM students
+            WHERE is_active = 1
+              AND ((face_embedding IS NOT NULL AND face_model = %s)
+                   OR (face_embedding IS NULL AND face_encoding IS NOT NULL))
+        """, (FACE_MODEL,))
+        count, max_updated_at, checksum = cursor.fetchone()
+    return {
+        'count': int(count),
+        'max_updated_at': float(max_updated_at) if max_updated_at is not None else None,
+        'checksum': int(checksum or 0)
+    }
+
+
+def row_digest(row):
+    """Checksum of a students row, to tell same-second edits apart since updated_at has one-second resolution"""
+    return zlib.crc32(repr(tuple(row)).encode())
+
+
+class GallerySnapshotStore:
+    """Versioned gallery snapshots on disk: a .npy encodings matrix memory-mapped at startup
+    plus a JSON file with the parallel student details
+
+    Parent contact details are never written to disk; they are read from the database after
+    loading. The files are created readable by the service user only.
+
+    Snapshot files are named after the database state they were built from, so a snapshot is
+    used only while the students table is unchanged. Mapped pages are shared through the page
+    cache by every process that opens the same snapshot.
+    """
+
+    def __init__(self, directory='face_models', keep=2):
+        self.directory = directory
+        self.keep = keep
+        self.loaded_key = None
+        self.hits = 0
+        self.misses = 0
+        self.last_load_seconds = None
+
+    def key(self, state):
+        fingerprint = json.dumps([SNAPSHOT_FORMAT, FACE_MODEL, state], sort_keys=True)
+        return hashlib.sha1(fingerprint.encode()).hexdigest()[:16]
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, f"gallery-v{SNAPSHOT_FORMAT}-{key}")
+        return base + '.npy', base + '.json', base + '.samples.npy'
+
+    def load(self, state=None):
+        """Return a gallery for state, or the newest snapshot when state is None; None on a miss"""
+        started = time.time()
+        if state is not None:
+            encodings_path, meta_path, samples_path = self._paths(self.key(state))
+        else:
+            snapshots = sorted((path for path in glob.glob(os.path.join(self.directory, f"gallery-v{SNAPSHOT_FORMAT}-*.npy"))
+                                if not path.endswith('.samples.npy')), key=os.path.getmtime)
+            if not snapshots:
+                return None
+            encodings_path = snapshots[-1]
+            meta_path = encodings_path[:-4] + '.json'
+            samples_path = encodings_path[:-4] + '.samples.npy'
+
+        # The .npy is written last, so its presence means the snapshot is complete
+        if not os.path.exists(encodings_path):
+            self.misses += 1
+            return None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            encodings = np.load(encodings_path, mmap_mode='r')
+            samples = None
+            if meta['sample_student_ids'] is not None:
+                samples = SampleBank(np.load(samples_path, mmap_mode='r'), meta['sample_student_ids'])
+            gallery = FaceGallery(
+                encodings, meta['student_ids'], meta['names'], meta['roll_numbers'],
+                grades=meta['grades'], samples=samples, version=meta['version']
+            )
+            gallery.version_rows = {int(student_id): digest for student_id, digest in meta['version_rows'].items()}
+            gallery.rejected_ids = frozenset(meta['rejected_ids'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading gallery snapshot {encodings_path}: {e}")
+            self.misses += 1
+            return None
+
+        self.loaded_key = meta.get('key')
+        self.hits += 1
+        self.last_load_seconds = time.time() - started
+        return gallery
+
+    def save(self, gallery, state):
+        """Write a snapshot of gallery for state atomically and prune older snapshots"""
+        key = self.key(state)
+        encodings_path, meta_path, samples_path = self._paths(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            meta = {
+                'key': key,
+                'format': SNAPSHOT_FORMAT,
+                'model': FACE_MODEL,
+                'state': state,
+                'version': gallery.version,
+                'version_rows': {str(student_id): digest for student_id, digest in gallery.version_rows.items()},
+                'rejected_ids': sorted(gallery.rejected_ids),
+                'created_at': time.time(),
+                'student_ids': gallery.student_ids.tolist(),
+                'names': gallery.names,
+                'roll_numbers': gallery.roll_numbers,
+                'grades': gallery.grades,
+                'sample_student_ids': gallery.samples.student_ids.tolist() if gallery.samples is not None else None
+            }
+            with self._open(meta_path + '.tmp', 'w') as f:
+                json.dump(meta, f)
+            os.replace(meta_path + '.tmp', meta_path)
+
+            if gallery.samples is not None:
+                with self._open(samples_path + '.tmp', 'wb') as f:
+                    np.save(f, np.ascontiguousarray(gallery.samples.encodings, dtype=np.float32))
+                os.replace(samples_path + '.tmp', samples_path)
+
+            with self._open(encodings_path + '.tmp', 'wb') as f:
+                np.save(f, np.ascontiguousarray(gallery.encodings, dtype=np.float32))
+            os.replace(encodings_path + '.tmp', encodings_path)
+        except (OSError, TypeError) as e:
+            print(f"Error writing gallery snapshot: {e}")
+            return None
+
+        self.loaded_key = key
+        self._prune(keep_path=encodings_path)
+        return encodings_path
+
+    def _open(self, path, mode):
+        # Student names and face encodings stay private to the service user
+        return os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), mode)
+
+    def _prune(self, keep_path):
+        # Unlinking is safe while another process still maps an old snapshot
+        snapshots = sorted((path for path in glob.glob(os.path.join(self.directory, 'gallery-v*.npy'))
+                            if not path.endswith('.samples.npy')), key=os.path.getmtime)
+        stale = [path for path in snapshots if path != keep_path][:max(0, len(snapshots) - self.keep)]
+        for path in stale:
+            for stale_path in (path, path[:-4] + '.json', path[:-4] + '.samples.npy'):
+                try:
+                    os.remove(stale_path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        return {
+            'directory': self.directory,
+            'loaded_key': self.loaded_key,
+            'hits': self.hits,
+            'misses': self.misses,
+            'last_load_ms': round(self.last_load_seconds * 1000.0, 1) if self.last_load_seconds is not None else None
+        }
@@ -0,0 +1,224 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fractions import Fraction
+from multiprocessing import shared_memory
+
+import cv2
+import face_recognition
+import numpy as np
+
+from detectors import get_detector
+from frame_ring import FrameRef
+
+# Padding dlib's face encoder keeps around the aligned face chip, as a fraction of the face size
+CHIP_PADDING = 0.25
+
+# Shared memory segments attached by this worker process, most recently used last
+_attached = OrderedDict()
+
+
+def _attach(name):
+    segment = _attached.pop(name, None)
+    if segment is None:
+        segment = shared_memory.SharedMemory(name=name)
+        if len(_attached) >= 64:
+            _, stale = _attached.popitem(last=False)
+            stale.close()
+    _attached[name] = segment
+    return segment
+
+
+def _alignment(scale):
+    """Frame-pixel step whose multiples land on whole pixels at scale, e.g. 4 at 0.25 and 20 at 0.35"""
+    step = Fraction(scale).limit_denominator(1000).denominator
+    # Odd scales would need huge steps; their rounding error is under a pixel anyway
+    return step if step <= 64 else 1
+
+
+def detect_faces(frame, scale, regions=None, detector=None):
+    """Detect faces on a downscaled copy of a BGR frame and return their locations
+
+    With regions, only those (left, top, right, bottom) crops are scanned. Locations are
+    always returned in downscaled full-frame coordinates. detector is a spec from
+    detectors.detector_spec; None uses dlib HOG. Encoding happens separately, on face
+    chips batched by encode_chips.
+    """
+    face_detector = get_detector(detector)
+    if regions is None:
+        regions = [(0, 0, frame.shape[1], frame.shape[0])]
+
+    align = _alignment(scale)
+    face_locations = []
+    for left, top, right, bottom in regions:
+        # Aligned origins keep face boxes exact once mapped back from the downscaled crop
+        left -= left % align
+        top -= top % align
+        crop = frame[top:bottom, left:right]
+        # Slivers (e.g. an ROI box grazing a motion box) would downscale to nothing
+        if round(crop.shape[0] * scale) < 1 or round(crop.shape[1] * scale) < 1:
+            continue
+        small_frame = cv2.resize(crop, (0, 0), fx=scale, fy=scale)
+
+        locations = face_detector.detect(small_frame)
+
+        dx = int(round(left * scale))
+        dy = int(round(top * scale))
+        face_locations.extend((t + dy, r + dx, b + dy, l + dx) for t, r, b, l in locations)
+
+    return face_locations
+
+
+def face_chip(frame, location, scale, margin=0.25):
+    """Cut one face, with a margin for its landmarks, out of a full-size frame at detection scale
+
+    location is in detection-scale coordinates; returns the chip and the face location inside it.
+    """
+    top, right, bottom, left = location
+    pad = int((bottom - top) * margin)
+    height = int(frame.shape[0] * scale)
+    width = int(frame.shape[1] * scale)
+    chip_top, chip_bottom = max(0, top - pad), min(height, bottom + pad)
+    chip_left, chip_right = max(0, left - pad), min(width, right + pad)
+
+    crop = frame[int(chip_top / scale):int(chip_bottom / scale), int(chip_left / scale):int(chip_right / scale)]
+    chip = cv2.resize(crop, (chip_right - chip_left, chip_bottom - chip_top), interpolation=cv2.INTER_AREA)
+    return chip, (top - chip_top, right - chip_left, bottom - chip_top, left - chip_left)
+
+
+def encode_chips(chips, face_locations):
+    """Encode faces cut from any number of frames in one pass by tiling the chips side by side
+
+    Tiles are separated by zero columns at least as wide as the padding dlib adds around the
+    aligned face chip, so no face's chip picks up pixels of its neighbour.
+    """
+    if not chips:
+        return []
+    largest = max(max(bottom - top, right - left) for top, right, bottom, left in face_locations)
+    gap = int(np.ceil(CHIP_PADDING * largest)) + 1
+    width = sum(chip.shape[1] for chip in chips) + gap * (len(chips) - 1)
+    mosaic = np.zeros((max(chip.shape[0] for chip in chips), width, 3), dtype=np.uint8)
+    shifted = []
+    x = 0
+    for chip, (top, right, bottom, left) in zip(chips, face_locations):
+        mosaic[:chip.shape[0], x:x + chip.shape[1]] = chip
+        shifted.append((top, right + x, bottom, left + x))
+        x += chip.shape[1] + gap
+
+    rgb_mosaic = cv2.cvtColor(mosaic, cv2.COLOR_BGR2RGB)
+    return face_recognition.face_encodings(rgb_mosaic, shifted)
+
+
+def _frame_view(frame_ref):
+    segment = _attach(frame_ref.segment_name)
+    return np.ndarray(frame_ref.shape, dtype=frame_ref.dtype, buffer=segment.buf, offset=frame_ref.offset)
+
+
+def _worker_detect(frame_ref, scale, regions=None, detector=None):
+    """Process pool entry point: read the frame in place from shared memory"""
+    return detect_faces(_frame_view(frame_ref), scale, regions, detector)
+
+
+def _worker_encode_chips(chips, face_locations):
+    """Process pool entry point for one micro-batch of face chips"""
+    return [encoding.astype(np.float32) for encoding in encode_chips(chips, face_locations)]
+
+
+class InferenceEngine:
+    """Runs detection and encoding on a pool of worker processes to escape the GIL"""
+
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.executor = None
+        if workers > 0:
+            self.executor = self._new_executor()
+        self.restarts = 0
+
+        self._segments = {}
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _new_executor(self):
+        # spawn keeps workers free of the parent's threads, sockets and DB connections
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _run(self, fn, *args):
+        """Run fn on the pool; a pool broken by a crashed worker is replaced and the call retried once"""
+        executor = self.executor
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool as e:
+            with self._lock:
+                # Another camera thread may already have replaced it
+                if self.executor is executor:
+                    print(f"Inference worker died, restarting the pool: {e}")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self.executor = self._new_executor()
+                    self.restarts += 1
+                executor = self.executor
+        return executor.submit(fn, *args).result()
+
+    def _frame_segment(self, camera_id, frame):
+        """Return the camera's shared memory segment, (re)allocated to fit the frame"""
+        with self._lock:
+            segment = self._segments.get(camera_id)
+            if segment is None or segment.size < frame.nbytes:
+                if segment is not None:
+                    segment.close()
+                    segment.unlink()
+                segment = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+                self._segments[camera_id] = segment
+            return segment
+
+    def _shared(self, camera_id, frame, frame_ref):
+        if frame_ref is None:
+            # Each camera thread has at most one request in flight, so its segment is never
+            # overwritten while a worker is still reading it
+            segment = self._frame_segment(camera_id, frame)
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=segment.buf)[...] = frame
+            frame_ref = FrameRef(segment.name, 0, frame.shape, frame.dtype.str)
+        return frame_ref
+
+    def detect_faces(self, camera_id, frame, scale=0.25, frame_ref=None, regions=None, detector=None):
+        """Detect faces, blocking the calling camera thread until their locations are back
+
+        Frames already in a shared memory ring are passed by frame_ref and never copied.
+        Workers build each detector spec once and keep it for later frames.
+        """
+        if self.executor is None:
+            return detect_faces(frame, scale, regions, detector)
+
+        frame_ref = self._shared(camera_id, frame, frame_ref)
+        return self._run(_worker_detect, frame_ref, scale, regions, detector)
+
+    def encode_chips(self, chips, face_locations):
+        """Encode a micro-batch of face chips, possibly from several cameras"""
+        if not chips:
+            return []
+        if self.executor is None:
+            return encode_chips(chips, face_locations)
+        return self._run(_worker_encode_chips, chips, face_locations)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+                segment.unlink()
+            self._segments.clear()
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'mode': 'process_pool' if self.executor is not None else 'in_thread',
+            'restarts': self.restarts,
+            'shared_segments': len(self._segments)
+        }
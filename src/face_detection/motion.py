@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+
+from camera_config import camera_setting
+
+
+def merge_regions(regions):
+    """Union overlapping (left, top, right, bottom) boxes so no face is detected twice"""
+    merged = []
+    for region in sorted(regions):
+        for i, other in enumerate(merged):
+            if region[0] <= other[2] and other[0] <= region[2] and region[1] <= other[3] and other[1] <= region[3]:
+                merged[i] = (min(region[0], other[0]), min(region[1], other[1]),
+                             max(region[2], other[2]), max(region[3], other[3]))
+                break
+        else:
+            merged.append(region)
+
+    if len(merged) < len(regions):
+        return merge_regions(merged)
+    return merged
+
+
+class MotionGate:
+    """Cheap frame-differencing gate that skips face detection on static scenes"""
+
+    def __init__(self, width=160, threshold=25, min_area=0.002, learning_rate=0.05,
+                 padding=0.15, full_frame_ratio=0.6):
+        self.width = width
+        self.threshold = threshold
+        self.min_area = min_area
+        self.learning_rate = learning_rate
+        self.padding = padding
+        self.full_frame_ratio = full_frame_ratio
+        self.background = None
+
+        self.gated = 0
+        self.processed = 0
+
+    @classmethod
+    def for_camera(cls, camera_id):
+        """Build a gate from per-camera MOTION_* settings, or None when gating is disabled"""
+        if not camera_setting('MOTION_GATE', camera_id, True, bool):
+            return None
+        return cls(
+            width=camera_setting('MOTION_WIDTH', camera_id, 160, int),
+            threshold=camera_setting('MOTION_THRESHOLD', camera_id, 25, int),
+            min_area=camera_setting('MOTION_MIN_AREA', camera_id, 0.002),
+            learning_rate=camera_setting('MOTION_LEARNING_RATE', camera_id, 0.05)
+        )
+
+    def check(self, frame):
+        """Return (moving, regions); regions are (left, top, right, bottom) boxes in frame pixels, or None for the whole frame"""
+        height, width = frame.shape[:2]
+        factor = width / float(self.width)
+        small = cv2.resize(frame, (self.width, max(1, int(round(height / factor)))), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self.background is None or self.background.shape != gray.shape:
+            # Nothing to compare against yet: process the whole frame
+            self.background = gray.astype(np.float32)
+            self.processed += 1
+            return True, None
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+
+        _, mask = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+        mask = cv2.dilate(mask, None, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        min_pixels = self.min_area * gray.shape[0] * gray.shape[1]
+        boxes = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= min_pixels]
+        if not boxes:
+            self.gated += 1
+            return False, []
+
+        self.processed += 1
+        regions = merge_regions([self._to_frame(box, factor, width, height) for box in boxes])
+
+        covered = sum((r - l) * (b - t) for l, t, r, b in regions)
+        if covered >= self.full_frame_ratio * width * height:
+            return True, None
+        return True, regions
+
+    def _to_frame(self, box, factor, width, height):
+        """Scale a small-frame box to frame pixels and pad it (faces sit above moving bodies)"""
+        x, y, w, h = box
+        pad_x = self.padding * w + 2
+        pad_y = self.padding * h + 2
+        left = max(0, int((x - pad_x) * factor))
+        top = max(0, int((y - pad_y) * factor))
+        right = min(width, int((x + w + pad_x) * factor))
+        bottom = min(height, int((y + h + pad_y) * factor))
+        return left, top, right, bottom
+
+    def stats(self):
+        return {'gated': self.gated, 'processed': self.processed}
@@ -0,0 +1,105 @@
+import cv2
+import face_recognition
+import numpy as np
+
+from camera_config import camera_setting
+
+
+class QualityGate:
+    """Cheap pre-encoding checks that skip faces which would never match: too small, blurred,
+    badly lit or turned away from the camera
+
+    Checks run cheapest first on the full-resolution face crop; the landmark-based pose check
+    only runs for faces that passed the others.
+    """
+
+    REASONS = ('size', 'brightness', 'sharpness', 'pose')
+
+    def __init__(self, min_face_px=48, min_sharpness=40.0, min_brightness=40, max_brightness=220,
+                 max_yaw=0.35, sample_size=64):
+        self.min_face_px = min_face_px
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.max_yaw = max_yaw
+        self.sample_size = sample_size
+
+        self.checked = 0
+        self.passed = 0
+        self.rejected = {reason: 0 for reason in self.REASONS}
+
+    @classmethod
+    def for_camera(cls, camera_id):
+        """Build a gate from per-camera QUALITY_* settings, or None when gating is disabled"""
+        if not camera_setting('QUALITY_GATE', camera_id, True, bool):
+            return None
+        return cls(
+            min_face_px=camera_setting('QUALITY_MIN_FACE_PX', camera_id, 48, int),
+            min_sharpness=camera_setting('QUALITY_MIN_SHARPNESS', camera_id, 40.0),
+            min_brightness=camera_setting('QUALITY_MIN_BRIGHTNESS', camera_id, 40, int),
+            max_brightness=camera_setting('QUALITY_MAX_BRIGHTNESS', camera_id, 220, int),
+            max_yaw=camera_setting('QUALITY_MAX_YAW', camera_id, 0.35)
+        )
+
+    def assess(self, frame, location, scale):
+        """Return None when the detection-scale (top, right, bottom, left) face is worth encoding, else the reason"""
+        top, right, bottom, left = (int(round(value / scale)) for value in location)
+        height, width = frame.shape[:2]
+        top, bottom = max(0, top), min(height, bottom)
+        left, right = max(0, left), min(width, right)
+        if min(bottom - top, right - left) < self.min_face_px:
+            return 'size'
+
+        crop = frame[top:bottom, left:right]
+        # A fixed-size sample makes sharpness comparable between near and far faces
+        gray = cv2.cvtColor(cv2.resize(crop, (self.sample_size, self.sample_size), interpolation=cv2.INTER_AREA),
+                            cv2.COLOR_BGR2GRAY)
+        brightness = float(gray.mean())
+        if brightness < self.min_brightness or brightness > self.max_brightness:
+            return 'brightness'
+        if cv2.Laplacian(gray, cv2.CV_64F).var() < self.min_sharpness:
+            return 'sharpness'
+
+        if self.max_yaw > 0 and abs(self.yaw(crop)) > self.max_yaw:
+            return 'pose'
+        return None
+
+    def yaw(self, crop):
+        """Horizontal nose offset from the eye midpoint relative to the eye distance; about 0 when frontal
+
+        Uses dlib's 5-point landmark model, a small fraction of the cost of an encoding.
+        """
+        rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+        landmarks = face_recognition.face_landmarks(rgb, [(0, crop.shape[1], crop.shape[0], 0)], model='small')
+        if not landmarks:
+            return 0.0
+        points = landmarks[0]
+        left_eye = np.mean(points['left_eye'], axis=0)
+        right_eye = np.mean(points['right_eye'], axis=0)
+        nose = np.mean(points['nose_tip'], axis=0)
+        eye_distance = float(np.linalg.norm(right_eye - left_eye))
+        if eye_distance < 1.0:
+            # Eyes collapsed onto each other: a full profile
+            return 1.0
+        return float(nose[0] - (left_eye[0] + right_eye[0]) / 2.0) / eye_distance
+
+    def filter(self, frame, face_locations, scale):
+        """Return a keep flag per face and count the rejections"""
+        keep = []
+        for location in face_locations:
+            reason = self.assess(frame, location, scale)
+            self.checked += 1
+            if reason is None:
+                self.passed += 1
+            else:
+                self.rejected[reason] += 1
+            keep.append(reason is None)
+        return keep
+
+    def stats(self):
+        return {
+            'checked': self.checked,
+            'passed': self.passed,
+            'rejected': dict(self.rejected),
+            'rejection_rate': round(1.0 - self.passed / float(self.checked), 3) if self.checked else 0.0
+        }
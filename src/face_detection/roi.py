@@ -0,0 +1,78 @@
+import json
+
+import cv2
+import numpy as np
+
+from motion import merge_regions
+
+
+class DetectionZone:
+    """A camera's region-of-interest polygons, stored as [[x, y], ...] normalised to 0..1
+
+    Detection only scans the bounding boxes of the polygons, and faces whose centre lies
+    outside every polygon (people walking past the doorway) are discarded.
+    """
+
+    def __init__(self, polygons, min_size=24):
+        self.polygons = [np.asarray(polygon, dtype=np.float32) for polygon in polygons if len(polygon) >= 3]
+        # Overlaps narrower than this (in frame pixels) cannot hold a detectable face
+        self.min_size = min_size
+        self._shape = None
+        self._pixel_polygons = []
+        self._boxes = []
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a zone from polygon JSON strings; invalid polygons are skipped"""
+        polygons = []
+        for row in rows:
+            try:
+                polygons.append(json.loads(row))
+            except (TypeError, ValueError) as e:
+                print(f"Error parsing ROI polygon: {e}")
+        return cls(polygons)
+
+    def __bool__(self):
+        return bool(self.polygons)
+
+    def _fit(self, shape):
+        """Convert the polygons to pixel coordinates for a frame shape, once per resolution"""
+        if self._shape == shape[:2]:
+            return
+        height, width = shape[:2]
+        self._pixel_polygons = []
+        boxes = []
+        for polygon in self.polygons:
+            points = np.round(np.clip(polygon, 0, 1) * (width, height)).astype(np.int32)
+            self._pixel_polygons.append(points)
+            x, y, w, h = cv2.boundingRect(points)
+            boxes.append((x, y, min(width, x + w), min(height, y + h)))
+        self._boxes = merge_regions(boxes)
+        self._shape = shape[:2]
+
+    def regions(self, shape, motion_regions=None):
+        """(left, top, right, bottom) areas to scan: the ROI boxes, cut down to motion_regions if given"""
+        self._fit(shape)
+        if motion_regions is None:
+            return list(self._boxes)
+
+        regions = []
+        for left, top, right, bottom in self._boxes:
+            for m_left, m_top, m_right, m_bottom in motion_regions:
+                region = (max(left, m_left), max(top, m_top), min(right, m_right), min(bottom, m_bottom))
+                if region[2] - region[0] >= self.min_size and region[3] - region[1] >= self.min_size:
+                    regions.append(region)
+        return regions
+
+    def inside(self, location, scale, shape):
+        """True when the centre of a detection-scale (top, right, bottom, left) box lies inside a polygon"""
+        self._fit(shape)
+        top, right, bottom, left = location
+        centre = ((left + right) / (2.0 * scale), (top + bottom) / (2.0 * scale))
+        return any(cv2.pointPolygonTest(polygon, centre, False) >= 0 for polygon in self._pixel_polygons)
+
+    def draw(self, frame):
+        """Outline the zone on a frame"""
+        self._fit(frame.shape)
+        cv2.polylines(frame, self._pixel_polygons, True, (0, 255, 255), 2)
+        return frame
@@ -0,0 +1,130 @@
+import os
+import threading
+
+from camera_config import camera_setting
+from capture import RateMeter
+
+
+def host_load():
+    """One-minute load average per CPU, or None where the platform does not report it"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+class AdaptiveSampler:
+    """Per-camera controller for how often frames are analysed and at what detection scale
+
+    Samples densely, and at higher resolution when faces are small, while faces are in view.
+    Backs off when the scene is idle or detection exceeds its latency or host load budget.
+    """
+
+    def __init__(self, interval=5, min_interval=1, max_interval=15, scale=0.25, min_scale=0.2,
+                 max_scale=0.5, scale_step=0.05, budget_ms=250.0, max_load=0.9, small_face_px=50,
+                 adaptive=True):
+        self.base_interval = interval
+        self.base_scale = scale
+        self.interval = interval
+        self.scale = scale
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.scale_step = scale_step
+        self.budget_ms = budget_ms
+        self.max_load = max_load
+        self.small_face_px = small_face_px
+        self.adaptive = adaptive
+
+        self.latency_ms = None
+        self.reason = 'initial'
+        self.frames_since_sample = 0
+        self.detection_meter = RateMeter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_camera(cls, camera_id):
+        """Build a controller from per-camera SAMPLING_* and DETECTION_* settings"""
+        return cls(
+            interval=camera_setting('SAMPLING_INTERVAL', camera_id, 5, int),
+            min_interval=camera_setting('SAMPLING_MIN_INTERVAL', camera_id, 1, int),
+            max_interval=camera_setting('SAMPLING_MAX_INTERVAL', camera_id, 15, int),
+            scale=camera_setting('DETECTION_SCALE', camera_id, 0.25),
+            min_scale=camera_setting('DETECTION_MIN_SCALE', camera_id, 0.2),
+            max_scale=camera_setting('DETECTION_MAX_SCALE', camera_id, 0.5),
+            budget_ms=camera_setting('DETECTION_BUDGET_MS', camera_id, 250.0),
+            max_load=camera_setting('SAMPLING_MAX_LOAD', camera_id, 0.9),
+            small_face_px=camera_setting('SMALL_FACE_PX', camera_id, 50, int),
+            adaptive=camera_setting('SAMPLING_ADAPTIVE', camera_id, True, bool)
+        )
+
+    def should_sample(self):
+        """Call once per frame; True when this frame is due for analysis"""
+        self.frames_since_sample += 1
+        if self.frames_since_sample < self.interval:
+            return False
+        self.frames_since_sample = 0
+        return True
+
+    def _clamp_scale(self, scale):
+        return round(min(self.max_scale, max(self.min_scale, scale)), 3)
+
+    def record(self, latency, face_locations):
+        """Feed back one detection: its wall time in seconds and the faces found (detection-scale boxes)"""
+        self.detection_meter.tick()
+        with self._lock:
+            latency_ms = latency * 1000.0
+            if self.latency_ms is None:
+                self.latency_ms = latency_ms
+            else:
+                self.latency_ms += 0.2 * (latency_ms - self.latency_ms)
+            if not self.adaptive:
+                return
+
+            load = host_load()
+            if self.latency_ms > self.budget_ms or (load is not None and load > self.max_load):
+                # Over budget: sample less often and on smaller frames
+                self.interval = min(self.max_interval, self.interval + 1)
+                self.scale = self._clamp_scale(self.scale - self.scale_step)
+                self.reason = 'overloaded'
+            elif face_locations:
+                # Faces in view: sample densely so tracks settle quickly
+                self.interval = max(self.min_interval, self.interval // 2)
+                smallest = min(bottom - top for top, right, bottom, left in face_locations)
+                if smallest < self.small_face_px:
+                    self.scale = self._clamp_scale(self.scale + self.scale_step)
+                    self.reason = 'small_faces'
+                elif smallest > 2 * self.small_face_px:
+                    self.scale = self._clamp_scale(self.scale - self.scale_step)
+                    self.reason = 'large_faces'
+                else:
+                    self.reason = 'faces'
+            else:
+                self._back_off()
+
+    def idle(self):
+        """Feed back a sampled frame that needed no detection (static scene)"""
+        with self._lock:
+            if self.adaptive:
+                self._back_off()
+
+    def _back_off(self):
+        # Called with self._lock held: drift towards a sparse interval and the configured scale
+        self.interval = min(self.max_interval, self.interval + 1)
+        if self.scale > self.base_scale:
+            self.scale = self._clamp_scale(max(self.base_scale, self.scale - self.scale_step))
+        self.reason = 'idle'
+
+    def stats(self):
+        with self._lock:
+            return {
+                'adaptive': self.adaptive,
+                'interval': self.interval,
+                'scale': self.scale,
+                'latency_ms': round(self.latency_ms, 1) if self.latency_ms is not None else None,
+                'budget_ms': self.budget_ms,
+                'host_load': host_load(),
+                'detection_fps': round(self.detection_meter.value(), 2),
+                'reason': self.reason
+            }
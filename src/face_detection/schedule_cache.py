@@ -0,0 +1,135 @@
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+SCHEDULE_CHANNEL = 'detection_schedule_updates'
+
+
+def _to_seconds(value):
+    """Convert a MySQL TIME value (timedelta or 'HH:MM:SS') to seconds since midnight"""
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    hours, minutes, seconds = (int(part) for part in str(value).split(':'))
+    return hours * 3600 + minutes * 60 + seconds
+
+
+class ScheduleSnapshot:
+    """Immutable view of the global flag and merged schedule intervals per camera and day"""
+
+    def __init__(self, detection_enabled, rows):
+        self.detection_enabled = detection_enabled
+        self.loaded_at = time.time()
+
+        # Any row, active or not, switches a camera from always-on to scheduled
+        self.scheduled_cameras = set()
+        spans = {}
+        for camera_id, day_of_week, start_time, end_time, is_active in rows:
+            self.scheduled_cameras.add(camera_id)
+            if is_active:
+                key = (camera_id, str(day_of_week).lower())
+                spans.setdefault(key, []).append((_to_seconds(start_time), _to_seconds(end_time)))
+
+        # Merge overlapping windows into sorted, disjoint start/end arrays for bisect
+        self.intervals = {}
+        for key, windows in spans.items():
+            starts, ends = [], []
+            for start, end in sorted(windows):
+                if starts and start <= ends[-1]:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self.intervals[key] = (starts, ends)
+
+    def is_active(self, camera_id, now):
+        if not self.detection_enabled:
+            return False
+
+        # If no schedules exist at all, detection is active
+        if camera_id not in self.scheduled_cameras:
+            return True
+
+        windows = self.intervals.get((camera_id, now.strftime('%A').lower()))
+        if not windows:
+            return False
+
+        starts, ends = windows
+        seconds = now.hour * 3600 + now.minute * 60 + now.second
+        i = bisect_right(starts, seconds) - 1
+        return i >= 0 and seconds <= ends[i]
+
+
+class DetectionScheduleCache:
+    """In-process detection schedule, reloaded on Redis pub/sub invalidation"""
+
+    def __init__(self, db_pool, redis_client, channel=SCHEDULE_CHANNEL, max_age=300):
+        self.db_pool = db_pool
+        self.redis_client = redis_client
+        self.channel = channel
+        self.max_age = max_age
+        self.snapshot = None
+        self.reloads = 0
+        self.lookups = 0
+        self._reload_lock = threading.Lock()
+
+    def reload(self):
+        """Load the global flag and all schedule rows and swap in a new snapshot"""
+        with self._reload_lock:
+            with self.db_pool.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT setting_value FROM system_settings
+                        WHERE setting_key = 'detection_enabled'
+                    """)
+                    result = cursor.fetchone()
+
+                    cursor.execute("""
+                        SELECT camera_id, day_of_week, start_time, end_time, is_active
+                        FROM detection_schedule
+                    """)
+                    rows = cursor.fetchall()
+
+            self.snapshot = ScheduleSnapshot(bool(result) and result[0] == 'true', rows)
+            self.reloads += 1
+            return self.snapshot
+
+    def is_active(self, camera_id, now=None):
+        """Answer from memory whether detection should run for a camera right now"""
+        self.lookups += 1
+        snapshot = self.snapshot
+        if snapshot is None:
+            snapshot = self.reload()
+        return snapshot.is_active(camera_id, now or datetime.now())
+
+    def start_listener(self):
+        """Start a daemon thread that reloads on invalidation messages and after max_age"""
+        thread = threading.Thread(target=self._listen)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    snapshot = self.snapshot
+                    stale = snapshot is None or time.time() - snapshot.loaded_at > self.max_age
+                    if message or stale:
+                        self.reload()
+            except Exception as e:
+                print(f"Error in detection schedule listener: {e}")
+                time.sleep(5)
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {
+            'reloads': self.reloads,
+            'lookups': self.lookups,
+            'detection_enabled': snapshot.detection_enabled if snapshot else None,
+            'scheduled_cameras': len(snapshot.scheduled_cameras) if snapshot else 0,
+            'age_seconds': round(time.time() - snapshot.loaded_at, 1) if snapshot else None
+        }
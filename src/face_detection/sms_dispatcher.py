@@ -0,0 +1,313 @@
+import os
+import random
+import socket
+import threading
+import time
+
+import redis
+import requests
+from requests.adapters import HTTPAdapter
+
+SMS_OUTBOX_STREAM = 'sms_outbox'
+SMS_DEAD_LETTER_STREAM = 'sms_outbox_dead'
+
+# Longest sleep between delivery attempts, in seconds
+BACKOFF_CAP = 30.0
+
+
+class TwilioProvider:
+    """Send SMS using Twilio"""
+
+    name = 'twilio'
+
+    def send(self, session, timeout, phone, message, api_key, api_secret, sender_id):
+        url = f"https://api.twilio.com/2010-04-01/Accounts/{api_key}/Messages.json"
+        data = {
+            'From': sender_id,
+            'To': phone,
+            'Body': message
+        }
+        response = session.post(url, data=data, auth=(api_key, api_secret), timeout=timeout)
+
+        if response.status_code == 201:
+            return True, False, None
+        retryable = response.status_code == 429 or response.status_code >= 500
+        return False, retryable, response.text
+
+
+class NexmoProvider:
+    """Send SMS using Nexmo (Vonage)"""
+
+    name = 'nexmo'
+
+    def send(self, session, timeout, phone, message, api_key, api_secret, sender_id):
+        url = "https://rest.nexmo.com/sms/json"
+        data = {
+            'api_key': api_key,
+            'api_secret': api_secret,
+            'to': phone,
+            'from': sender_id,
+            'text': message
+        }
+        response = session.post(url, data=data, timeout=timeout)
+        if response.status_code == 429 or response.status_code >= 500:
+            return False, True, response.text
+
+        result = response.json()
+        status = result.get('messages', [{}])[0].get('status')
+        if status == '0':
+            return True, False, None
+        # Status 1 is Nexmo's "throttled"
+        return False, status == '1', result
+
+
+class StubProvider:
+    """Local provider that records messages instead of sending them, for tests and development"""
+
+    name = 'stub'
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, session, timeout, phone, message, api_key, api_secret, sender_id):
+        self.sent.append((phone, message))
+        print(f"[stub SMS] to {phone}: {message}")
+        return True, False, None
+
+
+class TokenBucket:
+    """Simple blocking rate limiter"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.time()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SmsDispatcher:
+    """Delivers parent notifications from a durable Redis stream outbox on dedicated workers"""
+
+    def __init__(self, db_pool, redis_client, workers=4, rate_per_second=5.0, max_attempts=5,
+                 timeout=10.0, config_ttl=300, stream=SMS_OUTBOX_STREAM, group='sms_dispatchers'):
+        self.db_pool = db_pool
+        self.redis_client = redis_client
+        self.workers = workers
+        self.rate_per_second = rate_per_second
+        self.max_attempts = max_attempts
+        self.timeout = (3.05, timeout)
+        # A pending message is only reclaimed once it has been idle longer than a worst-case
+        # delivery (every attempt timing out, every backoff at the cap), with a 2x margin
+        self.reclaim_idle_ms = int(2000 * max_attempts * (sum(self.timeout) + BACKOFF_CAP))
+        self.config_ttl = config_ttl
+        self.stream = stream
+        self.group = group
+        self.consumer_prefix = f"{socket.gethostname()}-{os.getpid()}"
+
+        # One keep-alive session shared by all workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.providers = {
+            'twilio': TwilioProvider(),
+            'nexmo': NexmoProvider(),
+            'stub': StubProvider()
+        }
+        self.provider_override = os.getenv('SMS_PROVIDER_OVERRIDE', '').lower() or None
+        self._limiters = {}
+
+        self._config = None
+        self._config_loaded_at = 0.0
+        self._config_lock = threading.Lock()
+
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def get_sms_config(self):
+        """Return the active sms_config row, cached for config_ttl seconds"""
+        with self._config_lock:
+            if self._config is None or time.time() - self._config_loaded_at > self.config_ttl:
+                with self.db_pool.connection() as connection:
+                    with connection.cursor() as cursor:
+                        cursor.execute("""
+                            SELECT provider, api_key, api_secret, sender_id
+                            FROM sms_config
+                            WHERE is_active = 1
+                            LIMIT 1
+                        """)
+                        # An empty tuple marks "no configuration" so it is cached too
+                        self._config = cursor.fetchone() or ()
+                self._config_loaded_at = time.time()
+            return self._config
+
+    def invalidate_config(self):
+        with self._config_lock:
+            self._config = None
+
+    def enqueue(self, phone, message):
+        """Add a message to the outbox stream; returns the stream entry id"""
+        entry_id = self.redis_client.xadd(
+            self.stream, {'phone': phone, 'message': message, 'attempts': 0},
+            maxlen=100000, approximate=True
+        )
+        with self._lock:
+            self.enqueued += 1
+        return entry_id
+
+    def start(self):
+        """Create the consumer group and start worker and reclaim threads"""
+        try:
+            self.redis_client.xgroup_create(self.stream, self.group, id='0', mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+        threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(f"{self.consumer_prefix}-{i}",))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        # Messages left pending by a crashed or restarted process are claimed back
+        thread = threading.Thread(target=self._reclaim, args=(f"{self.consumer_prefix}-reclaim",))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+        return threads
+
+    def _run(self, consumer):
+        while True:
+            try:
+                entries = self.redis_client.xreadgroup(
+                    self.group, consumer, {self.stream: '>'}, count=1, block=5000
+                )
+                for _, messages in entries or []:
+                    for entry_id, fields in messages:
+                        self._deliver(entry_id, fields)
+            except Exception as e:
+                print(f"Error in SMS dispatcher: {e}")
+                time.sleep(1)
+
+    def _reclaim(self, consumer):
+        # The idle threshold must exceed a worst-case delivery with all retries,
+        # otherwise a message still being retried would be claimed and sent twice
+        while True:
+            try:
+                result = self.redis_client.xautoclaim(
+                    self.stream, self.group, consumer, self.reclaim_idle_ms, start_id='0-0', count=10
+                )
+                for entry_id, fields in result[1]:
+                    if fields:
+                        self._deliver(entry_id, fields)
+            except Exception as e:
+                print(f"Error reclaiming SMS messages: {e}")
+            time.sleep(30)
+
+    def _finish(self, entry_id):
+        pipe = self.redis_client.pipeline()
+        pipe.xack(self.stream, self.group, entry_id)
+        pipe.xdel(self.stream, entry_id)
+        pipe.execute()
+
+    def _backoff(self, attempt):
+        # Exponential backoff with full jitter, capped at BACKOFF_CAP
+        return random.uniform(0, min(BACKOFF_CAP, 0.5 * (2 ** attempt)))
+
+    def _deliver(self, entry_id, fields):
+        attempts = int(fields.get('attempts', 0))
+        phone = fields['phone']
+        message = fields['message']
+
+        while True:
+            ok, retryable, detail = self._send(phone, message)
+            if ok is None:
+                with self._lock:
+                    self.skipped += 1
+                self._finish(entry_id)
+                return
+            if ok:
+                print(f"SMS sent successfully to {phone}")
+                with self._lock:
+                    self.sent += 1
+                self._finish(entry_id)
+                return
+
+            attempts += 1
+            if not retryable or attempts >= self.max_attempts:
+                print(f"Failed to send SMS to {phone} after {attempts} attempts: {detail}")
+                self.redis_client.xadd(
+                    SMS_DEAD_LETTER_STREAM,
+                    {'phone': phone, 'message': message, 'attempts': attempts, 'error': str(detail)},
+                    maxlen=10000, approximate=True
+                )
+                with self._lock:
+                    self.failed += 1
+                self._finish(entry_id)
+                return
+
+            with self._lock:
+                self.retries += 1
+            time.sleep(self._backoff(attempts))
+
+    def _send(self, phone, message):
+        """Send one message; returns (ok, retryable, detail), with ok=None when SMS is not configured"""
+        sms_config = self.get_sms_config()
+        if not sms_config and self.provider_override:
+            sms_config = (self.provider_override, None, None, None)
+        if not sms_config:
+            print("No SMS configuration found")
+            return None, False, None
+
+        provider_name, api_key, api_secret, sender_id = sms_config
+        provider = self.providers.get(self.provider_override or provider_name.lower())
+        if provider is None:
+            print(f"Unsupported SMS provider: {provider_name}")
+            return None, False, None
+
+        limiter = self._limiters.get(provider.name)
+        if limiter is None:
+            limiter = self._limiters.setdefault(provider.name, TokenBucket(self.rate_per_second))
+        limiter.acquire()
+
+        try:
+            return provider.send(self.session, self.timeout, phone, message, api_key, api_secret, sender_id)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            return False, True, e
+        except Exception as e:
+            return False, False, e
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'enqueued': self.enqueued,
+                'sent': self.sent,
+                'retries': self.retries,
+                'failed': self.failed,
+                'skipped': self.skipped
+            }
+        try:
+            stats['outbox_length'] = self.redis_client.xlen(self.stream)
+            stats['pending'] = self.redis_client.xpending(self.stream, self.group)['pending']
+        except Exception:
+            pass
+        return stats
@@ -0,0 +1,243 @@
+import itertools
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+from camera_config import camera_setting
+
+
+def _correlation_tracker():
+    """Create the best correlation tracker this OpenCV build provides, or None"""
+    for name in ('TrackerKCF_create', 'TrackerCSRT_create', 'TrackerMIL_create'):
+        factory = getattr(cv2, name, None) or getattr(getattr(cv2, 'legacy', None), name, None)
+        if factory is not None:
+            return factory()
+    return None
+
+
+def _iou(a, b):
+    """IoU between every pair of (top, right, bottom, left) boxes in a and b"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    top = np.maximum(a[:, None, 0], b[None, :, 0])
+    right = np.minimum(a[:, None, 1], b[None, :, 1])
+    bottom = np.minimum(a[:, None, 2], b[None, :, 2])
+    left = np.maximum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    area_a = (a[:, 1] - a[:, 3]) * (a[:, 2] - a[:, 0])
+    area_b = (b[:, 1] - b[:, 3]) * (b[:, 2] - b[:, 0])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+class Track:
+    """One face followed across frames, with the identity votes collected for it"""
+
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.created_at = time.time()
+        self.hits = 1
+        self.misses = 0
+        self.since_encoding = 0
+        self.correlation = None
+
+        # student_id -> [observations, summed confidence, gallery match]
+        self.votes = defaultdict(lambda: [0, 0.0, None])
+        self.observations = 0
+        self.emitted = False
+
+    def vote(self, student_id, confidence, match):
+        self.observations += 1
+        self.since_encoding = 0
+        entry = self.votes[student_id]
+        entry[0] += 1
+        entry[1] += confidence
+        if match is not None:
+            entry[2] = match
+
+    def leader(self):
+        """Return (student_id, observations, mean confidence, match) for the most voted identity"""
+        if not self.votes:
+            return None, 0, 0.0, None
+        student_id, (count, total, match) = max(self.votes.items(), key=lambda item: (item[1][0], item[1][1]))
+        return student_id, count, total / count, match
+
+    def settled(self, min_votes, min_share):
+        """True once enough consistent observations agree on one identity"""
+        _, count, _, _ = self.leader()
+        return count >= min_votes and count >= min_share * self.observations
+
+    def label(self, min_votes, min_share):
+        """Name and confidence to draw; unsettled tracks stay Unknown to avoid flicker"""
+        student_id, _, confidence, match = self.leader()
+        if student_id is None or match is None or not self.settled(min_votes, min_share):
+            return "Unknown", 0.0
+        gallery, index = match
+        return gallery.names[index], confidence
+
+
+class FaceTracker:
+    """Associates detections with tracks by IoU (centroid distance as fallback) so encodings
+    are only computed for new or unsettled tracks and each track yields one attendance event"""
+
+    def __init__(self, iou_threshold=0.3, centroid_ratio=0.5, max_misses=3, min_votes=3,
+                 min_share=0.6, reencode_interval=10, correlation=False):
+        self.iou_threshold = iou_threshold
+        self.centroid_ratio = centroid_ratio
+        self.max_misses = max_misses
+        self.min_votes = min_votes
+        self.min_share = min_share
+        self.reencode_interval = reencode_interval
+        self.correlation = correlation
+
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+        self.tracks_created = 0
+        self.encodings_computed = 0
+        self.encodings_skipped = 0
+        self.events_emitted = 0
+
+    @classmethod
+    def for_camera(cls, camera_id):
+        """Build a tracker from per-camera TRACKER_* settings, or None when tracking is disabled"""
+        if not camera_setting('TRACKER', camera_id, True, bool):
+            return None
+        return cls(
+            iou_threshold=camera_setting('TRACKER_IOU', camera_id, 0.3),
+            max_misses=camera_setting('TRACKER_MAX_MISSES', camera_id, 3, int),
+            min_votes=camera_setting('TRACKER_MIN_VOTES', camera_id, 3, int),
+            reencode_interval=camera_setting('TRACKER_REENCODE_INTERVAL', camera_id, 10, int),
+            correlation=camera_setting('TRACKER_CORRELATION', camera_id, False, bool)
+        )
+
+    def update(self, face_locations, scanned=None):
+        """Associate detected (top, right, bottom, left) boxes with tracks
+
+        Returns one track per location, in order. scanned lists the (top, right, bottom, left)
+        areas that were searched; tracks outside them are kept rather than counted as missed.
+        """
+        assigned = [None] * len(face_locations)
+        unmatched = set(range(len(self.tracks)))
+
+        if self.tracks and face_locations:
+            iou = _iou([track.box for track in self.tracks], face_locations)
+            # Greedy assignment, best overlap first
+            for flat in np.argsort(-iou, axis=None):
+                t, d = divmod(int(flat), len(face_locations))
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if t in unmatched and assigned[d] is None:
+                    assigned[d] = self.tracks[t]
+                    unmatched.discard(t)
+
+            # Fast movers that no longer overlap their previous box: nearest centroid
+            for d, box in enumerate(face_locations):
+                if assigned[d] is not None:
+                    continue
+                best, best_distance = None, None
+                for t in unmatched:
+                    distance = self._centroid_distance(self.tracks[t].box, box)
+                    if distance <= self.centroid_ratio * (box[1] - box[3]) and (best is None or distance < best_distance):
+                        best, best_distance = t, distance
+                if best is not None:
+                    assigned[d] = self.tracks[best]
+                    unmatched.discard(best)
+
+        for d, box in enumerate(face_locations):
+            track = assigned[d]
+            if track is None:
+                track = Track(next(self._ids), box)
+                self.tracks.append(track)
+                self.tracks_created += 1
+                assigned[d] = track
+            else:
+                track.box = box
+                track.hits += 1
+                track.misses = 0
+                track.since_encoding += 1
+            track.correlation = None
+
+        for t in unmatched:
+            track = self.tracks[t]
+            if not scanned or _iou([track.box], scanned).max() > 0:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        return assigned
+
+    def _centroid_distance(self, a, b):
+        return np.hypot((a[1] + a[3] - b[1] - b[3]) / 2.0, (a[0] + a[2] - b[0] - b[2]) / 2.0)
+
+    def needs_encoding(self, track):
+        """Encode new and unsettled tracks, and settled ones every reencode_interval detections"""
+        needed = (track.observations == 0
+                  or not track.settled(self.min_votes, self.min_share)
+                  or track.since_encoding >= self.reencode_interval)
+        if needed:
+            self.encodings_computed += 1
+        else:
+            self.encodings_skipped += 1
+        return needed
+
+    def observe(self, track, student_id, confidence, match):
+        """Record one recognition result for a track"""
+        track.vote(student_id, confidence, match)
+
+    def take_event(self, track, threshold):
+        """Return the (gallery, index) match and confidence to record once per track, else None"""
+        if track.emitted or not track.settled(self.min_votes, self.min_share):
+            return None
+        student_id, _, confidence, match = track.leader()
+        if student_id is None or match is None or confidence <= threshold:
+            return None
+        track.emitted = True
+        self.events_emitted += 1
+        return match, confidence
+
+    def rescale(self, ratio):
+        """Follow a change of detection scale; boxes are kept in detection-scale coordinates"""
+        for track in self.tracks:
+            track.box = tuple(int(round(value * ratio)) for value in track.box)
+            track.correlation = None
+
+    def follow(self, frame, scale):
+        """Move track boxes with correlation trackers between detections (TRACKER_CORRELATION)"""
+        if not self.correlation or not self.tracks:
+            return
+        small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        for track in self.tracks:
+            top, right, bottom, left = track.box
+            if track.correlation is None:
+                track.correlation = _correlation_tracker()
+                if track.correlation is None:
+                    self.correlation = False
+                    return
+                track.correlation.init(small_frame, (int(left), int(top), int(right - left), int(bottom - top)))
+                continue
+            ok, (x, y, w, h) = track.correlation.update(small_frame)
+            if ok:
+                track.box = (int(y), int(x + w), int(y + h), int(x))
+
+    def labels(self):
+        """Return boxes, names and confidences of the live tracks for drawing"""
+        boxes, names, confidences = [], [], []
+        for track in self.tracks:
+            if track.misses:
+                continue
+            name, confidence = track.label(self.min_votes, self.min_share)
+            boxes.append(track.box)
+            names.append(name)
+            confidences.append(confidence)
+        return boxes, names, confidences
+
+    def stats(self):
+        return {
+            'active_tracks': len(self.tracks),
+            'tracks_created': self.tracks_created,
+            'encodings_computed': self.encodings_computed,
+            'encodings_skipped': self.encodings_skipped,
+            'events_emitted': self.events_emitted
+        }
@@ -113,6 +113,100 @@ class Camera {
         return false;
     }
 
+    public function readZones() {
+        // Detection zone polygons of every camera, keyed by camera id
+        $zones = array();
+        try {
+            $stmt = $this->conn->query("SELECT camera_id, polygon FROM camera_rois WHERE is_active = 1 ORDER BY camera_id, id");
+            while ($row = $stmt->fetch(PDO::FETCH_ASSOC)) {
+                $zones[$row['camera_id']][] = json_decode($row['polygon'], true);
+            }
+        } catch (Exception $e) {
+            // camera_rois not migrated yet: every camera scans the full frame
+        }
+        return $zones;
+    }
+
+    public function saveZones($polygons) {
+        // Replace the camera's zones; each polygon is a list of [x, y] points normalised to 0..1
+        $clean = array();
+        foreach ($polygons as $polygon) {
+            if (!is_array($polygon) || count($polygon) < 3) {
+                continue;
+            }
+            $points = array();
+            foreach ($polygon as $point) {
+                if (!is_array($point) || count($point) != 2 || !is_numeric($point[0]) || !is_numeric($point[1])) {
+                    continue 2;
+                }
+                $points[] = array(
+                    round(min(1, max(0, (float)$point[0])), 4),
+                    round(min(1, max(0, (float)$point[1])), 4)
+                );
+            }
+            $clean[] = $points;
+        }
+
+        try {
+            $this->conn->beginTransaction();
+
+            $stmt = $this->conn->prepare("DELETE FROM camera_rois WHERE camera_id = ?");
+            $stmt->execute(array($this->id));
+
+            $stmt = $this->conn->prepare("INSERT INTO camera_rois (camera_id, polygon) VALUES (?, ?)");
+            foreach ($clean as $points) {
+                $stmt->execute(array($this->id, json_encode($points)));
+            }
+
+            $this->conn->commit();
+        } catch (Exception $e) {
+            $this->conn->rollBack();
+            return false;
+        }
+
+        // Let the face detection service reload the zones
+        Utils::notifyDetectionService('/api/refresh_cameras');
+        return true;
+    }
+
+    public function readGrades() {
+        // Grade ids linked to every camera, keyed by camera id
+        $grades = array();
+        try {
+            $stmt = $this->conn->query("SELECT camera_id, grade_id FROM camera_grades ORDER BY camera_id, grade_id");
+            while ($row = $stmt->fetch(PDO::FETCH_ASSOC)) {
+                $grades[$row['camera_id']][] = (int)$row['grade_id'];
+            }
+        } catch (Exception $e) {
+            // camera_grades not migrated yet: every camera searches the whole school
+        }
+        return $grades;
+    }
+
+    public function saveGrades($grade_ids) {
+        // Replace the grades whose students this camera can see; none means the whole school
+        try {
+            $this->conn->beginTransaction();
+
+            $stmt = $this->conn->prepare("DELETE FROM camera_grades WHERE camera_id = ?");
+            $stmt->execute(array($this->id));
+
+            $stmt = $this->conn->prepare("INSERT INTO camera_grades (camera_id, grade_id) VALUES (?, ?)");
+            foreach (array_unique(array_map('intval', $grade_ids)) as $grade_id) {
+                $stmt->execute(array($this->id, $grade_id));
+            }
+
+            $this->conn->commit();
+        } catch (Exception $e) {
+            $this->conn->rollBack();
+            return false;
+        }
+
+        // Let the face detection service rebuild the camera's gallery partition
+        Utils::notifyDetectionService('/api/refresh_cameras');
+        return true;
+    }
+
     public function getActiveCameras() {
         $query = "SELECT id, name, rtsp_url, username, password, location 
                   FROM " . $this->table_name . " 
@@ -16,6 +16,11 @@ class DetectionSchedule {
         $this->conn = $db;
     }
 
+    private function notifyChanged() {
+        // Let the face detection service drop its in-memory schedule
+        Utils::notifyDetectionService('/api/refresh_schedule');
+    }
+
     public function create() {
         $query = "INSERT INTO " . $this->table_name . "
                   SET camera_id=:camera_id, day_of_week=:day_of_week, 
@@ -36,6 +41,7 @@ class DetectionSchedule {
         $stmt->bindParam(":is_active", $this->is_active);
 
         if($stmt->execute()) {
+            $this->notifyChanged();
             return true;
         }
         return false;
@@ -108,6 +114,7 @@ class DetectionSchedule {
         $stmt->bindParam(':id', $this->id);
 
         if($stmt->execute()) {
+            $this->notifyChanged();
             return true;
         }
         return false;
@@ -119,6 +126,7 @@ class DetectionSchedule {
         $stmt->bindParam(1, $this->id);
 
         if($stmt->execute()) {
+            $this->notifyChanged();
             return true;
         }
         return false;
@@ -130,6 +138,7 @@ class DetectionSchedule {
         $stmt->bindParam(1, $camera_id);
 
         if($stmt->execute()) {
+            $this->notifyChanged();
             return true;
         }
         return false;
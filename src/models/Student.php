@@ -138,6 +138,8 @@ class Student {
         $stmt->bindParam(':id', $this->id);
 
         if($stmt->execute()) {
+            // Names and deactivations reach the face gallery through an incremental refresh
+            Utils::notifyDetectionService('/api/refresh_faces?wait=false');
             return true;
         }
         return false;
@@ -149,18 +151,21 @@ class Student {
         $stmt->bindParam(1, $this->id);
 
         if($stmt->execute()) {
+            Utils::notifyDetectionService('/api/refresh_faces?wait=false');
             return true;
         }
         return false;
     }
 
     public function updateFaceEncoding($face_encoding) {
-        $query = "UPDATE " . $this->table_name . " SET face_encoding = ? WHERE id = ?";
+        // Clear the binary copy so the detection service uses the new JSON encoding
+        $query = "UPDATE " . $this->table_name . " SET face_encoding = ?, face_embedding = NULL WHERE id = ?";
         $stmt = $this->conn->prepare($query);
         $stmt->bindParam(1, $face_encoding);
         $stmt->bindParam(2, $this->id);
 
         if($stmt->execute()) {
+            Utils::notifyDetectionService('/api/refresh_faces?wait=false');
             return true;
         }
         return false;